@@ -1,9 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from verifier import Verifier
+from result_cache import ClaimResultCache
+from authority_registry import reload_authority_registry
+from batching import scheduler_stats
+from metrics import profiled, register_cache, render_prometheus
 from typing import List, Dict, Any
 from fastapi.middleware.cors import CORSMiddleware
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import threading
 import uvicorn
 import os
 
@@ -20,25 +29,201 @@ app.add_middleware(
 
 # Initialize Research Verifier
 # We initialize it once to benefit from model caching
-verifier = Verifier(k=10, m=5, mode="web")
+verifier = Verifier(k=10, m=5, mode="web", early_exit=os.environ.get("ARES_EARLY_EXIT") == "1")
+# Models load lazily; the server warms them up front so the first claim is not slow
+verifier.preload()
+
+# Paraphrases of recently verified claims are answered from the semantic result cache
+# (ARES_RESULT_CACHE=0 disables it)
+result_cache = None
+if os.environ.get("ARES_RESULT_CACHE", "1") != "0":
+    result_cache = ClaimResultCache(
+        verifier.similarity,
+        threshold=float(os.environ.get("ARES_RESULT_CACHE_THRESHOLD", "0.9")),
+        ttl=float(os.environ.get("ARES_RESULT_CACHE_TTL", "3600")),
+        max_entries=int(os.environ.get("ARES_RESULT_CACHE_SIZE", "10000")),
+    )
+    register_cache("result", result_cache.stats)
+
+def cached_verify(claim: str, k: int, m: int) -> Dict[str, Any]:
+    if result_cache is None:
+        return {**verifier.verify(claim, k=k, m=m), "cache_hit": False}
+    hit = result_cache.get(claim, (k, m))
+    if hit is not None:
+        return {**hit, "cache_hit": True}
+    result = verifier.verify(claim, k=k, m=m)
+    result_cache.put(claim, (k, m), result)
+    return {**result, "cache_hit": False}
+
+# Blocking inference and scraping run off the event loop on this pool,
+# so several claims are processed at once
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get("ARES_WORKERS", "4")))
 
 class ClaimRequest(BaseModel):
     claim: str
     k: int = 10
     m: int = 5
+    # Attach a cProfile report (worker thread only) to this response
+    profile: bool = False
 
 @app.post("/verify")
 async def verify_claim(req: ClaimRequest):
     try:
-        # Dynamically update parameters if requested
-        verifier.k = req.k
-        verifier.m = req.m
-        
-        result = verifier.verify(req.claim)
+        # Parameters are request-scoped; the shared verifier is never mutated
+        loop = asyncio.get_running_loop()
+        if req.profile:
+            result, report = await loop.run_in_executor(
+                executor, lambda: profiled(cached_verify, req.claim, k=req.k, m=req.m)
+            )
+            return {**result, "profile": report}
+        result = await loop.run_in_executor(
+            executor, lambda: cached_verify(req.claim, k=req.k, m=req.m)
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class VerificationCancelled(Exception):
+    pass
+
+@app.post("/verify/stream")
+async def verify_stream(req: ClaimRequest):
+    """
+    Server-Sent Events as the pipeline advances:
+    retrieval -> topm -> passage (one per NLI call) -> verdict
+    A client that disconnects stops the verification at the next event.
+    """
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def on_event(name: str, payload: Dict[str, Any]) -> None:
+        if cancelled.is_set():
+            raise VerificationCancelled()
+        if name == "verdict":
+            payload = {**payload, "cache_hit": False}
+        loop.call_soon_threadsafe(events.put_nowait, (name, payload))
+
+    def run() -> None:
+        try:
+            hit = result_cache.get(req.claim, (req.k, req.m)) if result_cache is not None else None
+            if hit is not None:
+                loop.call_soon_threadsafe(events.put_nowait, ("verdict", {**hit, "cache_hit": True}))
+                return
+            result = verifier.verify(req.claim, k=req.k, m=req.m, on_event=on_event)
+            if result_cache is not None:
+                result_cache.put(req.claim, (req.k, req.m), result)
+        except VerificationCancelled:
+            print("[INFO] Streaming client disconnected; verification stopped")
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ("error", {"detail": str(e)}))
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    async def stream():
+        executor.submit(run)
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    return
+                name, payload = item
+                yield f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            # Disconnect (or normal end): the worker aborts at its next event
+            cancelled.set()
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+class BatchClaimRequest(BaseModel):
+    claims: List[str]
+    k: int = 10
+    m: int = 5
+
+@app.post("/verify/batch")
+async def verify_batch(req: BatchClaimRequest):
+    """
+    Streams one NDJSON line per claim, in completion order:
+    {"index": i, ...same fields as /verify}
+    Cache hits are streamed first; the remaining claims are verified together.
+    """
+    loop = asyncio.get_running_loop()
+    params = (req.k, req.m)
+
+    async def stream():
+        misses = list(range(len(req.claims)))
+        if result_cache is not None:
+            misses = []
+            for i, claim in enumerate(req.claims):
+                hit = await loop.run_in_executor(executor, result_cache.get, claim, params)
+                if hit is None:
+                    misses.append(i)
+                else:
+                    yield json.dumps({"index": i, **hit, "cache_hit": True}) + "\n"
+        results = verifier.verify_many([req.claims[i] for i in misses], k=req.k, m=req.m)
+        # The generator is advanced on executor threads; the lock keeps close()
+        # from racing a next() still running after the client went away
+        results_lock = threading.Lock()
+
+        def advance():
+            with results_lock:
+                return next(results, None)
+
+        def close():
+            with results_lock:
+                results.close()
+
+        try:
+            while True:
+                try:
+                    item = await loop.run_in_executor(executor, advance)
+                except Exception as e:
+                    yield json.dumps({"error": str(e)}) + "\n"
+                    return
+                if item is None:
+                    return
+                j, result = item
+                if result_cache is not None:
+                    await loop.run_in_executor(executor, result_cache.put, req.claims[misses[j]], params, result)
+                yield json.dumps({"index": misses[j], **result, "cache_hit": False}) + "\n"
+        finally:
+            # Client gone (or done): stop the remaining claims off the event loop.
+            # Not awaited: on disconnect this task is being cancelled.
+            executor.submit(close)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text format: stage latency histograms, cache counters, batcher queues
+    schedulers = scheduler_stats()
+    gauges = {
+        "ares_scheduler_queue_depth": {f'scheduler="{st["name"]}"': st["queue_depth"] for st in schedulers},
+        "ares_scheduler_batches": {f'scheduler="{st["name"]}"': st["batches"] for st in schedulers},
+    }
+    return render_prometheus(gauges)
+
+@app.get("/stats/scheduler")
+async def get_scheduler_stats():
+    # Queue depth and batch-size statistics of the model micro-batchers
+    return scheduler_stats()
+
+@app.get("/stats/result-cache")
+async def get_result_cache_stats():
+    # Semantic claim-result cache hit rate and occupancy
+    return result_cache.stats() if result_cache is not None else {"enabled": False}
+
+@app.post("/authority/reload")
+async def reload_authority():
+    # Re-reads the domain rating file; cached W(E) values are invalidated
+    return {"domains": reload_authority_registry()}
+
+@app.get("/stats/entailment")
+async def get_entailment_stats():
+    # NLI cascade escalation rate and per-stage latency
+    return verifier.entailment.stats()
+
 # Mount Static Files (Frontend)
 app.mount("/", StaticFiles(directory=".", html=True), name="static")
 
@@ -1,3 +1,8 @@
+import csv
+import json
+import os
+import threading
+import time
 from typing import Dict
 
 # Authority Registry for ARES_POC
@@ -41,12 +46,124 @@ REPUTED_NEWS_DOMAINS = {
     "thelancet.com": "The Lancet"
 }
 
+# -------------------------------
+# Compiled index
+# -------------------------------
+# The built-in tiers above are extended (and overridden) by an external rating file,
+# ARES_AUTHORITY_FILE or authority_registry.csv next to this module, one domain per line:
+#   domain,weight[,name]        (.csv / .tsv; '#' starts a comment)
+#   {"domain", "weight", "name"} (.jsonl)
+# Lookups are longest-suffix matches, so news.un.org and apps.who.int inherit the
+# weight of un.org and who.int unless rated themselves.
+
+DEFAULT_AUTHORITY_FILE = os.environ.get(
+    "ARES_AUTHORITY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "authority_registry.csv"))
+
+def _builtin_weights() -> Dict[str, float]:
+    weights = {}
+    for domains, weight in ((REPUTED_NEWS_DOMAINS, 0.9), (FACT_CHECKER_DOMAINS, 0.95), (INSTITUTIONAL_DOMAINS, 1.0)):
+        for d in domains:
+            weights[d] = weight
+    return weights
+
+def _normalize_domain(domain: str) -> str:
+    domain = domain.strip().lower().rstrip('.')
+    return domain[4:] if domain.startswith("www.") else domain
+
+def load_authority_file(path: str) -> Dict[str, float]:
+    weights = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    obj = json.loads(line)
+                    weights[_normalize_domain(obj["domain"])] = float(obj["weight"])
+        else:
+            delimiter = '\t' if path.endswith(".tsv") else ','
+            for row in csv.reader(f, delimiter=delimiter):
+                if not row or row[0].lstrip().startswith('#'):
+                    continue
+                try:
+                    weights[_normalize_domain(row[0])] = float(row[1])
+                except (IndexError, ValueError):
+                    continue # header or malformed row
+    return weights
+
+class AuthorityIndex:
+    def __init__(self, path: str = DEFAULT_AUTHORITY_FILE, check_interval: float = 30.0,
+                 max_memo: int = 100000):
+        self.path = path
+        self.check_interval = check_interval
+        self.max_memo = max_memo
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0.0
+        # Bumped on every reload so callers can drop their own memoized weights
+        self.generation = 0
+        self.reload()
+
+    def reload(self) -> int:
+        """
+        Rebuilds the index from the built-in tiers and the rating file, then
+        swaps it in atomically. Returns the number of rated domains.
+        """
+        weights = _builtin_weights()
+        mtime = None
+        if self.path and os.path.exists(self.path):
+            mtime = os.path.getmtime(self.path)
+            try:
+                weights.update(load_authority_file(self.path))
+            except Exception as e:
+                print(f"[ERROR] Could not load authority file {self.path}: {e}")
+        with self._lock:
+            # Hash index keyed by full domain; a host is matched by probing its
+            # suffixes longest first, so cost is O(labels) regardless of list size
+            self._weights = weights
+            self._memo = {}
+            self._mtime = mtime
+            self._checked_at = time.time()
+            self.generation += 1
+        return len(weights)
+
+    def maybe_reload(self) -> None:
+        # Picks up an edited rating file without a restart, at most one stat() per interval
+        now = time.time()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self.path and os.path.exists(self.path) and os.path.getmtime(self.path) != self._mtime:
+            print(f"[INFO] Authority file changed, reloading {self.path}")
+            self.reload()
+
+    def lookup(self, host: str):
+        """
+        W(E) of the longest rated suffix of `host`, or None if no suffix is rated.
+        """
+        self.maybe_reload()
+        memo = self._memo
+        if host in memo:
+            return memo[host]
+        labels = _normalize_domain(host).split('.')
+        weights = self._weights
+        weight = None
+        for i in range(len(labels)):
+            suffix = '.'.join(labels[i:])
+            if suffix in weights:
+                weight = weights[suffix]
+                break
+        if len(memo) >= self.max_memo:
+            memo.clear()
+        memo[host] = weight
+        return weight
+
+    def __len__(self) -> int:
+        return len(self._weights)
+
+AUTHORITY_INDEX = AuthorityIndex()
+
+def reload_authority_registry() -> int:
+    return AUTHORITY_INDEX.reload()
+
 def get_authority_weight(domain: str) -> float:
-    """Returns the research-grade weight W(E) for a given domain."""
-    if domain in INSTITUTIONAL_DOMAINS:
-        return 1.0
-    if domain in FACT_CHECKER_DOMAINS:
-        return 0.95
-    if domain in REPUTED_NEWS_DOMAINS:
-        return 0.9
-    return None # Fallback to generic TLD/keyword logic
+    """Returns the research-grade weight W(E) for a given domain (or any parent domain)."""
+    return AUTHORITY_INDEX.lookup(domain) # None: fallback to generic TLD/keyword logic
@@ -0,0 +1,157 @@
+# Cross-request dynamic micro-batching for the S(C,E) and N(C,E) models.
+# Concurrent callers submit small lists of work; a single worker thread per model
+# concatenates them into one batch and routes each slice of the output back to
+# its caller. A lone caller is flushed at once; while there are concurrent
+# submitters (a second one on its way, or the previous batch served several),
+# a batch collects requests until max_batch_size items or max_wait_ms.
+# A request that would overflow the batch waits for the next one, a single
+# request larger than max_batch_size runs in slices, and when a batch fails
+# its requests are retried one by one so only the failing caller sees the error.
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+_SCHEDULERS = {}
+_SCHEDULERS_LOCK = threading.Lock()
+
+class MicroBatcher:
+    def __init__(self, fn: Callable[[List], List], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, name: str = "batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+        self.batch_size_histogram = {}
+        self._start()
+
+    def _start(self):
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        # Submitters whose request the worker has not taken yet (incl. ones still putting)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name=f"ares-{self.name}", daemon=True)
+        self._worker.start()
+
+    def submit(self, items: List) -> List:
+        """
+        Blocks until the batch containing `items` has run; returns one output per item.
+        """
+        if not items:
+            return []
+        future = Future()
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put((list(items), future))
+        return future.result()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize(),
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "max_batch_size": self.max_seen_batch,
+                "batch_size_histogram": dict(sorted(self.batch_size_histogram.items())),
+            }
+
+    def _take(self, timeout: float = None):
+        req = self._queue.get(timeout=timeout)
+        with self._pending_lock:
+            self._pending -= 1
+        return req
+
+    def _run(self):
+        concurrent = False
+        held = None
+        while True:
+            pending = [held or self._take()]
+            held = None
+            count = len(pending[0][0])
+            deadline = time.monotonic() + self.max_wait
+            # The wait timer only runs when there is concurrency to batch
+            while count < self.max_batch_size and (concurrent or len(pending) > 1 or self._pending > 0):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    req = self._take(timeout=remaining)
+                except queue.Empty:
+                    break
+                if count + len(req[0]) > self.max_batch_size:
+                    # Starts the next batch instead of overflowing this one
+                    held = req
+                    break
+                pending.append(req)
+                count += len(req[0])
+            concurrent = len(pending) > 1 or held is not None
+            self._flush(pending)
+
+    def _flush(self, pending):
+        batch = [item for items, _ in pending for item in items]
+        try:
+            outputs = self._call(batch)
+        except Exception as e:
+            if len(pending) == 1:
+                pending[0][1].set_exception(e)
+                return
+            # Isolate the request that broke the batch
+            for items, future in pending:
+                try:
+                    future.set_result(self._call(items))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for items, future in pending:
+            future.set_result(outputs[offset:offset + len(items)])
+            offset += len(items)
+
+    def _call(self, items: List) -> List:
+        outputs = []
+        for start in range(0, len(items), self.max_batch_size):
+            chunk = items[start:start + self.max_batch_size]
+            outputs.extend(self.fn(chunk))
+            n = len(chunk)
+            with self._stats_lock:
+                self.batches += 1
+                self.items += n
+                self.max_seen_batch = max(self.max_seen_batch, n)
+                self.batch_size_histogram[n] = self.batch_size_histogram.get(n, 0) + 1
+        return outputs
+
+def get_scheduler(key: str, fn: Callable[[List], List], **kwargs) -> MicroBatcher:
+    """
+    Returns the process-wide scheduler for `key` (e.g. a model name), creating it on first use.
+    """
+    with _SCHEDULERS_LOCK:
+        if key not in _SCHEDULERS:
+            _SCHEDULERS[key] = MicroBatcher(fn, name=key, **kwargs)
+        return _SCHEDULERS[key]
+
+def scheduler_stats() -> List[Dict]:
+    with _SCHEDULERS_LOCK:
+        return [s.stats() for s in _SCHEDULERS.values()]
+
+def _after_fork_in_child():
+    # Only the forking thread survives fork(); a pre-forked server worker
+    # (serve.py) gets fresh queues and worker threads, and starts its own counts
+    global _SCHEDULERS_LOCK
+    _SCHEDULERS_LOCK = threading.Lock()
+    for s in _SCHEDULERS.values():
+        s.batches = s.items = s.max_seen_batch = 0
+        s.batch_size_histogram = {}
+        s._start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,232 @@
+# Single-file retrieval cache for R(C).
+# SQLite in WAL mode: safe for concurrent readers/writers across threads and
+# worker processes, with per-mode TTL, LRU eviction and hit/miss counters.
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+# Web results go stale; local benchmark corpora do not (None = never expires)
+DEFAULT_TTL = {"web": 7 * 24 * 3600, "wiki": None, "liar": None}
+
+# Live stores, so connections opened before fork() are not reused in the child
+_STORES = weakref.WeakSet()
+
+class CacheStore:
+    def __init__(self, path: str = "cache/retrieval.sqlite3", ttl: Dict[str, Optional[float]] = None,
+                 max_entries: int = 100000, max_bytes: int = None, evict_every: int = 64):
+        self.path = path
+        self.ttl = dict(DEFAULT_TTL, **(ttl or {}))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.revalidated = 0
+        self._puts = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        _STORES.add(self)
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                mode TEXT,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_access ON entries(last_access)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers proceed while a writer commits
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, mode: str) -> Optional[List[Dict]]:
+        """
+        Returns the cached value, or None on a miss or an entry older than ttl[mode].
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        ttl = self.ttl.get(mode)
+        if row is not None and ttl is not None and now - row[1] > ttl:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            conn.commit()
+            with self._counter_lock:
+                self.expired += 1
+            row = None
+        if row is None:
+            with self._counter_lock:
+                self.misses += 1
+            return None
+
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        conn.commit()
+        with self._counter_lock:
+            self.hits += 1
+        return json.loads(row[0])
+
+    def get_entry(self, key: str) -> Optional[Tuple[object, float]]:
+        """
+        Returns (value, created_at) ignoring TTL, so callers can revalidate stale
+        entries instead of refetching them (e.g. conditional GETs for pages).
+        """
+        conn = self._conn()
+        row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+        with self._counter_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def touch(self, key: str) -> None:
+        """
+        Marks an entry as fresh again after a successful revalidation.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("UPDATE entries SET created_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+        conn.commit()
+        with self._counter_lock:
+            self.revalidated += 1
+
+    def put(self, key: str, mode: str, value: object, created_at: float = None) -> None:
+        payload = json.dumps(value)
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries (key, mode, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, mode, payload, len(payload), created_at or now, now)
+        )
+        conn.commit()
+        with self._counter_lock:
+            self._puts += 1
+            due = self._puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Drops least-recently-used entries beyond max_entries / max_bytes.
+        """
+        conn = self._conn()
+        removed = 0
+        if self.max_entries is not None:
+            cur = conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            removed += cur.rowcount
+        if self.max_bytes is not None:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            while total > self.max_bytes:
+                row = conn.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 1").fetchone()
+                if row is None:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+                total -= row[1]
+                removed += 1
+        conn.commit()
+        return removed
+
+    def stats(self) -> Dict:
+        count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        with self._counter_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "revalidated": self.revalidated,
+                "entries": count,
+                "bytes": size,
+            }
+
+    def migrate_from_dir(self, cache_dir: str, remove: bool = False) -> int:
+        """
+        Imports legacy cache/<md5>.json files. Keys are kept, so liar and wiki
+        claims still hit; the file mtime becomes the entry age for TTL purposes.
+        Web results are skipped: web keys now include k, and a legacy file holds
+        neither the claim nor the k it was fetched with, so it cannot be re-keyed
+        and would never be hit.
+        """
+        migrated = 0
+        skipped_web = 0
+        conn = self._conn()
+        for path in glob.glob(os.path.join(cache_dir, "*.json")):
+            key = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, 'r') as f:
+                    payload = f.read()
+                value = json.loads(payload)
+            except Exception:
+                continue
+            # Legacy web passages carry the http(s) URL of their page; local ones do not
+            if isinstance(value, list) and value and all(
+                    isinstance(p, dict) and str(p.get('url', '')).startswith(('http://', 'https://'))
+                    for p in value):
+                skipped_web += 1
+                continue
+            mtime = os.path.getmtime(path)
+            conn.execute(
+                "INSERT OR IGNORE INTO entries (key, mode, value, size, created_at, last_access) VALUES (?, NULL, ?, ?, ?, ?)",
+                (key, payload, len(payload), mtime, mtime)
+            )
+            migrated += 1
+            if remove:
+                os.remove(path)
+        conn.commit()
+        if skipped_web:
+            print(f"[INFO] Skipped {skipped_web} legacy web results (they are refetched on demand)")
+        return migrated
+
+def _after_fork_in_child():
+    # SQLite connections must not cross fork(): each pre-forked server worker
+    # opens its own. The inherited ones are kept referenced, not closed, so the
+    # parent's file locks are left alone.
+    for store in list(_STORES):
+        store._inherited = store._local
+        store._local = threading.local()
+        store._counter_lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ARES_POC retrieval cache maintenance")
+    parser.add_argument("command", choices=["migrate", "stats", "evict"])
+    parser.add_argument("--cache-dir", type=str, default="cache")
+    parser.add_argument("--remove", action="store_true", help="Delete legacy JSON files after import")
+    args = parser.parse_args()
+
+    store = CacheStore(os.path.join(args.cache_dir, "retrieval.sqlite3"))
+    if args.command == "migrate":
+        print(f"Migrated {store.migrate_from_dir(args.cache_dir, remove=args.remove)} entries.")
+    elif args.command == "evict":
+        print(f"Evicted {store.evict()} entries.")
+    print(json.dumps(store.stats(), indent=2))
@@ -1,5 +1,6 @@
 from urllib.parse import urlparse
-from authority_registry import get_authority_weight
+from authority_registry import AUTHORITY_INDEX
+from metrics import span
 
 class CredibilityWeight:
     def __init__(self):
@@ -7,6 +8,11 @@ class CredibilityWeight:
         self.trusted_tlds = ['.gov', '.edu', '.org', '.ac.uk', '.int', '.mil']
         self.news_keywords = ['news', 'reuters', 'apnews', 'bbc', 'nytimes', 'theguardian', 'npr']
         self.blog_keywords = ['blog', 'medium.com', 'substack', 'wordpress', 'blogspot']
+        # W(E) depends only on the host, so it is memoized per host and
+        # invalidated whenever the authority index is reloaded
+        self.authority = AUTHORITY_INDEX
+        self._memo = {}
+        self._generation = None
 
     def calculate(self, url: str) -> float:
         """
@@ -15,13 +21,30 @@ class CredibilityWeight:
         2. Checks TLDs (Categorical Fallback)
         3. Checks Keywords (Generic Fallback)
         """
+        with span("credibility"):
+            return self._calculate(url)
+
+    def _calculate(self, url: str) -> float:
         parsed_url = urlparse(url)
-        domain = parsed_url.netloc.lower()
+        domain = (parsed_url.hostname or "").lower()
         if domain.startswith("www."):
             domain = domain[4:]
         
-        # 1. Authority Registry Check (Highest Precision)
-        registry_weight = get_authority_weight(domain)
+        self.authority.maybe_reload()
+        if self._generation != self.authority.generation:
+            self._memo = {}
+            self._generation = self.authority.generation
+        weight = self._memo.get(domain)
+        if weight is None:
+            weight = self._host_weight(domain)
+            if len(self._memo) >= 100000:
+                self._memo = {}
+            self._memo[domain] = weight
+        return weight
+
+    def _host_weight(self, domain: str) -> float:
+        # 1. Authority Registry Check (Highest Precision, longest rated suffix)
+        registry_weight = self.authority.lookup(domain)
         if registry_weight is not None:
             return registry_weight
             
@@ -46,7 +69,9 @@ if __name__ == "__main__":
         "https://www.nasa.gov/science-mission-directorate/moon-mission",
         "https://www.nytimes.com/2023/01/01/science/moon.html",
         "https://myblog.wordpress.com/post1",
-        "https://random-site.xyz/article"
+        "https://random-site.xyz/article",
+        "https://news.un.org/en/story/2024/01/1",
+        "https://apps.who.int/iris/handle/10665"
     ]
     for u in urls:
         print(f"URL: {u} | Weight: {cw.calculate(u)}")
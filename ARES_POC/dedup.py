@@ -0,0 +1,87 @@
+# Near-duplicate passage elimination between R(C) and S(C,E).
+# Syndicated copies of one story (wire text re-published by many outlets) are
+# detected by MinHash over word 3-gram shingles; of each group of passages whose
+# estimated Jaccard similarity reaches `threshold`, only the copy with the highest
+# W(E) is kept, and the others are recorded on it under 'duplicates'.
+
+import re
+import zlib
+from typing import Dict, List
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_PRIME = (1 << 61) - 1
+
+class NearDuplicateFilter:
+    def __init__(self, credibility, threshold: float = 0.8, num_perm: int = 64, shingle_size: int = 3):
+        self.credibility = credibility
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        # Fixed seed: the same passages always collapse the same way
+        rng = np.random.default_rng(0)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def _shingles(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        n = self.shingle_size
+        grams = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        # crc32 rather than hash(): stable across processes
+        return np.array([zlib.crc32(g.encode('utf-8')) for g in grams], dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        MinHash_j(E) = min over shingles x of (a_j·x + b_j) mod p
+        """
+        x = self._shingles(text)
+        # a < 2^61 and x < 2^32 can overflow uint64; wrapping is fine for hashing
+        with np.errstate(over='ignore'):
+            return np.min((np.outer(x, self._a) + self._b) % _PRIME, axis=0)
+
+    def filter(self, passages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Passages with near-duplicates collapsed, in their original order.
+        Kept passages that absorbed copies carry
+        'duplicates': [{"source", "weight", "jaccard"}, ...].
+        """
+        if len(passages) < 2:
+            return passages
+        sigs = np.stack([self.signature(p['text']) for p in passages])
+        # Estimated Jaccard(E_i, E_j) = fraction of equal MinHash values
+        jaccard = (sigs[:, None, :] == sigs[None, :, :]).mean(axis=2)
+        weights = [self.credibility.calculate(p.get('url', 'http://internal.wiki')) for p in passages]
+
+        # Most credible first (ties: original order), so each group's representative is its best source
+        order = sorted(range(len(passages)), key=lambda i: (-weights[i], i))
+        kept = []
+        collapsed = {}
+        for i in order:
+            rep = next((r for r in kept if jaccard[i, r] >= self.threshold), None)
+            if rep is None:
+                kept.append(i)
+            else:
+                collapsed.setdefault(rep, []).append({
+                    "source": passages[i].get('url', 'internal'),
+                    "weight": weights[i],
+                    "jaccard": float(jaccard[i, rep])
+                })
+
+        result = []
+        for i in sorted(kept):
+            p = passages[i]
+            if i in collapsed:
+                p = dict(p, duplicates=collapsed[i])
+            result.append(p)
+        return result
+
+if __name__ == "__main__":
+    from credibility import CredibilityWeight
+    story = "The central bank raised its benchmark interest rate by a quarter point on Wednesday, citing persistent inflation."
+    passages = [
+        {"text": story, "url": "https://randomblog.xyz/copy"},
+        {"text": story + " Markets fell.", "url": "https://www.reuters.com/markets/rates"},
+        {"text": "Officials said the decision was unanimous and further hikes remain possible.", "url": "https://apnews.com/a"},
+    ]
+    for p in NearDuplicateFilter(CredibilityWeight()).filter(passages):
+        print(p['url'], p.get('duplicates'))
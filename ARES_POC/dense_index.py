@@ -0,0 +1,220 @@
+# Local dense-retrieval backend for R(C).
+# A corpus of passages is embedded once with the same MiniLM model as S(C,E) and
+# stored on disk:
+#   vectors.f16     - L2-normalised float16 matrix, memory-mapped, rows grouped by cluster
+#   ids.i64         - row -> passage id
+#   lists.i64       - IVF list boundaries into vectors.f16 (nlist + 1)
+#   centroids.npy   - IVF centroids (absent for a flat index)
+#   passages.jsonl  - {"text", "url"} per passage id (see passage_store.py)
+#   meta.json       - written last; marks a complete build
+# Search scans only the `nprobe` closest clusters, so cost is sublinear in corpus size.
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from passage_store import LazyMaps, PassageWriter, PassageStore, map_array
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+class DenseIndex:
+    def __init__(self, index_dir: str = "dense-index/", nprobe: int = 8):
+        self.index_dir = index_dir
+        self.nprobe = nprobe
+        with open(os.path.join(index_dir, "meta.json"), 'r') as f:
+            self.meta = json.load(f)
+        self.model_name = self.meta["model"]
+        self._encoder = None
+        self._maps = LazyMaps(self._load_maps)
+        self.passages = PassageStore(index_dir)
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, "meta.json"))
+
+    @staticmethod
+    def build(passages: Iterable[Dict[str, str]], index_dir: str = "dense-index/",
+              model_name: str = 'all-MiniLM-L6-v2', nlist: int = 0,
+              batch_size: int = 256, train_size: int = 100000) -> "DenseIndex":
+        """
+        One-time build step. `passages` yields {"text", "url"} dicts; nlist > 0
+        clusters the vectors (IVF) for sublinear search, nlist = 0 keeps a flat index.
+        """
+        from similarity import SimilarityFilter
+        encoder = SimilarityFilter(model_name=model_name, use_cache=False)
+
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        meta_path = os.path.join(index_dir, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        # -------------------------------
+        # Pass 1 — embed the corpus in batches (unordered vectors)
+        # -------------------------------
+        raw_path = os.path.join(index_dir, "vectors.raw.f16")
+        n, dim = 0, None
+        with PassageWriter(index_dir) as writer, open(raw_path, 'wb') as vf:
+            batch = []
+            for p in passages:
+                batch.append(p)
+                if len(batch) == batch_size:
+                    dim = DenseIndex._write_batch(encoder, batch, writer, vf)
+                    n += len(batch)
+                    batch = []
+            if batch:
+                dim = DenseIndex._write_batch(encoder, batch, writer, vf)
+                n += len(batch)
+        if n == 0:
+            raise ValueError("DenseIndex.build: corpus is empty")
+        raw = np.memmap(raw_path, dtype=np.float16, mode='r', shape=(n, dim))
+
+        # -------------------------------
+        # Pass 2 — optional IVF clustering, rows regrouped by cluster
+        # -------------------------------
+        nlist = min(nlist, n)
+        if nlist > 1:
+            rng = np.random.default_rng(0)
+            sample = raw[np.sort(rng.choice(n, size=min(n, train_size), replace=False))].astype(np.float32)
+            centroids = DenseIndex._kmeans(sample, nlist)
+            assign = np.empty(n, dtype=np.int64)
+            for s in range(0, n, 65536):
+                assign[s:s + 65536] = np.argmax(raw[s:s + 65536].astype(np.float32) @ centroids.T, axis=1)
+            order = np.argsort(assign, kind='stable')
+            lists = np.searchsorted(assign[order], np.arange(nlist + 1))
+            np.save(os.path.join(index_dir, "centroids.npy"), centroids)
+        else:
+            nlist = 1
+            if os.path.exists(os.path.join(index_dir, "centroids.npy")):
+                os.remove(os.path.join(index_dir, "centroids.npy"))
+            order = np.arange(n, dtype=np.int64)
+            lists = np.array([0, n], dtype=np.int64)
+
+        out = np.memmap(os.path.join(index_dir, "vectors.f16"), dtype=np.float16, mode='w+', shape=(n, dim))
+        for s in range(0, n, 65536):
+            out[s:s + 65536] = raw[order[s:s + 65536]]
+        out.flush()
+        del out, raw
+        os.remove(raw_path)
+        order.astype('<i8').tofile(os.path.join(index_dir, "ids.i64"))
+        np.asarray(lists, dtype='<i8').tofile(os.path.join(index_dir, "lists.i64"))
+
+        with open(meta_path, 'w') as f:
+            json.dump({"model": model_name, "count": int(n), "dim": int(dim), "nlist": int(nlist)}, f)
+        return DenseIndex(index_dir)
+
+    @staticmethod
+    def _write_batch(encoder, batch, writer, vf) -> int:
+        vectors = _normalize(encoder.encode([p['text'] for p in batch]))
+        vf.write(vectors.astype(np.float16).tobytes())
+        for p in batch:
+            writer.add(p)
+        return vectors.shape[1]
+
+    @staticmethod
+    def _kmeans(x: np.ndarray, k: int, iterations: int = 10) -> np.ndarray:
+        # Spherical k-means: vectors and centroids live on the unit sphere
+        rng = np.random.default_rng(0)
+        centroids = x[rng.choice(len(x), size=k, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(x @ centroids.T, axis=1)
+            for c in range(k):
+                members = x[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        return centroids
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def _load_maps(self) -> Dict:
+        d = self.index_dir
+        centroids_path = os.path.join(d, "centroids.npy")
+        return {
+            "vectors": map_array(os.path.join(d, "vectors.f16"), np.float16,
+                                 shape=(self.meta["count"], self.meta["dim"])),
+            "ids": map_array(os.path.join(d, "ids.i64"), '<i8'),
+            "lists": np.fromfile(os.path.join(d, "lists.i64"), dtype='<i8'),
+            "centroids": np.load(centroids_path) if os.path.exists(centroids_path) else None,
+        }
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._encoder is None:
+            from similarity import SimilarityFilter
+            self._encoder = SimilarityFilter(model_name=self.model_name)
+        return _normalize(self._encoder.encode(texts))
+
+    def search(self, claim: str, k: int = 10) -> List[Dict[str, str]]:
+        """
+        Top-k passages by cosine similarity to the claim.
+        """
+        maps = self._maps.get()
+        q = self._encode([claim])[0]
+
+        if maps["centroids"] is not None:
+            probes = np.argsort(-(maps["centroids"] @ q))[:self.nprobe]
+            ranges = [(int(maps["lists"][c]), int(maps["lists"][c + 1])) for c in probes]
+        else:
+            ranges = [(0, len(self))]
+
+        best_rows, best_scores = [], []
+        for start, end in ranges:
+            for s in range(start, end, 65536):
+                e = min(end, s + 65536)
+                scores = maps["vectors"][s:e].astype(np.float32) @ q
+                top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+                best_rows.append(top + s)
+                best_scores.append(scores[top])
+        if not best_rows:
+            return []
+        rows = np.concatenate(best_rows)
+        scores = np.concatenate(best_scores)
+        keep = np.argsort(-scores, kind='stable')[:k]
+
+        results = []
+        for r, score in zip(rows[keep], scores[keep]):
+            p = self.passages[int(maps["ids"][r])]
+            p['dense_score'] = float(score)
+            results.append(p)
+        return results
+
+def iter_wiki_passages(wiki_index) -> Iterator[Dict[str, str]]:
+    """
+    Every non-empty sentence of a WikiIndex as a passage, with the same URL
+    scheme evaluate.py uses for FEVER gold evidence.
+    """
+    for title, line_id, text in wiki_index.iter_sentences():
+        if text.strip():
+            yield {'text': text, 'url': f'wikipedia://{title}#L{line_id}'}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark the local dense-retrieval index")
+    parser.add_argument("--wiki-index", type=str, default="wiki-index/")
+    parser.add_argument("--index-dir", type=str, default="dense-index/")
+    parser.add_argument("--nlist", type=int, default=1024, help="IVF clusters (0 = flat index)")
+    parser.add_argument("--bench", type=str, default=None, help="Text file of claims to time search on")
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if not DenseIndex.exists(args.index_dir):
+        from wiki_index import WikiIndex
+        DenseIndex.build(iter_wiki_passages(WikiIndex(args.wiki_index)), args.index_dir, nlist=args.nlist)
+    index = DenseIndex(args.index_dir)
+    print(f"Dense index: {len(index)} passages, nlist={index.meta['nlist']}")
+
+    if args.bench:
+        with open(args.bench, 'r', encoding='utf-8') as f:
+            claims = [line.strip() for line in f if line.strip()]
+        index.search(claims[0], k=args.k)  # warm-up: model load and page-in
+        start = time.perf_counter()
+        for c in claims:
+            index.search(c, k=args.k)
+        elapsed = time.perf_counter() - start
+        print(f"{len(claims)} queries in {elapsed:.3f}s ({1000 * elapsed / len(claims):.2f} ms/query)")
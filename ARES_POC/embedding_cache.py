@@ -0,0 +1,199 @@
+# Content-addressed embedding store for the S(C,E) operator.
+# Key = sha1(model_name + text); vectors live in an in-memory LRU tier backed by
+# an on-disk float16 matrix (memory-mapped) with an append-only hash index.
+# Appends take an exclusive file lock, so several processes (evaluate.py and
+# serve.py workers) can share one store; each picks up the rows the others
+# appended when it next writes.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:
+    # Windows: evaluate.py's worker pool spawns processes there too
+    fcntl = None
+    import msvcrt
+
+@contextmanager
+def _exclusive(path: str):
+    """
+    Cross-process exclusive lock on the file at `path` (created if missing).
+    """
+    with open(path, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ~10 s of retries; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, cache_dir: str = "cache/embeddings", max_memory_items: int = 50000):
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()   # key -> float16 vector (LRU order)
+        self._index = {}               # key -> row in the on-disk matrix
+        self._matrix = None            # np.memmap over the first _mapped_rows rows
+        self._mapped_rows = 0
+        self._disk_rows = 0            # lines in the index file read so far
+        self._index_offset = 0         # bytes of the index file read so far
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        safe_name = model_name.replace('/', '__')
+        self.data_path = os.path.join(cache_dir, f"{safe_name}.f16")
+        self.index_path = os.path.join(cache_dir, f"{safe_name}.idx")
+        self.meta_path = os.path.join(cache_dir, f"{safe_name}.meta.json")
+        self.lock_path = os.path.join(cache_dir, f"{safe_name}.lock")
+        self._load()
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha1(f"{model_name}\x00{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Returns a float32 vector per text, or None where the text is not cached.
+        """
+        out = []
+        with self._lock:
+            for text in texts:
+                k = self.key(self.model_name, text)
+                vec = self._memory.get(k)
+                if vec is not None:
+                    self._memory.move_to_end(k)
+                elif k in self._index:
+                    vec = np.array(self._disk_row(self._index[k]))
+                    self._remember(k, vec)
+                if vec is None:
+                    self.misses += 1
+                    out.append(None)
+                else:
+                    self.hits += 1
+                    out.append(vec.astype(np.float32))
+        return out
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Stores vectors in both tiers. Vectors are rounded to float16 so a cached
+        embedding is bit-identical whichever tier it is later served from.
+        """
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with _exclusive(self.lock_path), open(self.meta_path, 'w') as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+
+            new_keys, new_rows = [], []
+            for text, vec in zip(texts, vectors):
+                k = self.key(self.model_name, text)
+                self._remember(k, vec)
+                if k not in self._index and k not in new_keys:
+                    new_keys.append(k)
+                    new_rows.append(vec)
+
+            if new_keys:
+                self._append(new_keys, new_rows)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+            "disk_items": len(self._index),
+        }
+
+    def _remember(self, k: str, vec: np.ndarray) -> None:
+        self._memory[k] = vec
+        self._memory.move_to_end(k)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _append(self, keys: List[str], rows: List[np.ndarray]) -> None:
+        row_bytes = self.dim * np.dtype(np.float16).itemsize
+        with _exclusive(self.lock_path), open(self.index_path, 'ab+') as idx:
+            # Index lines other processes appended since we last read; row i of
+            # the data file belongs to line i
+            idx.seek(self._index_offset)
+            for line in idx.read().splitlines():
+                k = line.strip().decode('ascii')
+                if k:
+                    self._index[k] = self._disk_rows
+                    self._disk_rows += 1
+            pending = [(k, v) for k, v in zip(keys, rows) if k not in self._index]
+            if pending:
+                # Data first, then index. A writer that died in between left
+                # data rows without index lines; they are overwritten here.
+                with open(self.data_path, 'ab') as f:
+                    f.truncate(self._disk_rows * row_bytes)
+                    f.write(np.stack([v for _, v in pending]).tobytes())
+                idx.write("".join(f"{k}\n" for k, _ in pending).encode('ascii'))
+                idx.flush()
+                for k, _ in pending:
+                    self._index[k] = self._disk_rows
+                    self._disk_rows += 1
+            self._index_offset = idx.tell()
+
+    def _disk_row(self, row: int) -> np.ndarray:
+        if row >= self._mapped_rows:
+            # Rows were appended since the last mapping; remap to cover them
+            self._mapped_rows = self._disk_rows
+            self._matrix = np.memmap(self.data_path, dtype=np.float16, mode='r',
+                                     shape=(self._mapped_rows, self.dim))
+        return self._matrix[row]
+
+    def _load(self) -> None:
+        # Under the append lock: another process may be between its data and
+        # index writes, which would look like an interrupted append
+        with _exclusive(self.lock_path):
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, 'r') as f:
+                self.dim = json.load(f)["dim"]
+
+            keys = []
+            if os.path.exists(self.index_path):
+                with open(self.index_path, 'r') as f:
+                    keys = [line.strip() for line in f if line.strip()]
+            row_bytes = self.dim * np.dtype(np.float16).itemsize
+            data_size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+
+            # Recover from an interrupted append by keeping only rows present in both files
+            n = min(len(keys), data_size // row_bytes)
+            if n != len(keys) or n * row_bytes != data_size:
+                keys = keys[:n]
+                with open(self.index_path, 'w') as f:
+                    f.write("".join(f"{k}\n" for k in keys))
+                with open(self.data_path, 'ab') as f:
+                    f.truncate(n * row_bytes)
+
+            self._index = {k: i for i, k in enumerate(keys)}
+            self._disk_rows = len(keys)
+            self._index_offset = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
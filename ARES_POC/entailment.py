@@ -1,48 +1,199 @@
-from transformers import pipeline
-from typing import List, Dict
+import os
+import threading
+import time
+from typing import List, Dict, Tuple
+from batching import get_scheduler
+from inference_backends import resolve_backend
+from model_registry import registry
+from metrics import span
+
+# Small MNLI model used as the first stage of the cascade
+CASCADE_MODEL = 'cross-encoder/nli-MiniLM2-L6-H768'
 
 class EntailmentOperator:
-    def __init__(self, model_name: str = 'facebook/bart-large-mnli'):
+    def __init__(self, model_name: str = 'facebook/bart-large-mnli', batch_size: int = 8,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, backend: str = None,
+                 cascade_model: str = None, cascade_margin: float = None):
         # Using the zero-shot-classification pipeline as it's a common wrapper for MNLI
         # or we can use raw SequenceClassification. Let's use raw for "mathematical" precision.
-        self.nli_pipeline = pipeline("text-classification", model=model_name, device=-1) # CPU for reproducibility in small env
+        # The pipeline is shared through the model registry and loaded on first use.
+        # backend: fp32 | int8 | onnx (default from ARES_NLI_BACKEND, else fp32)
+        self.backend = resolve_backend(backend, "ARES_NLI_BACKEND")
+        self.model_spec = ("nli-pipeline", model_name, self.backend)
+        self.batch_size = batch_size
+        # NLI pairs from concurrent verify() calls are micro-batched per model
+        spec = self.model_spec
+        self.scheduler = get_scheduler(
+            f"nli:{model_name}@{self.backend}",
+            lambda pairs: registry.get(*spec)(pairs, batch_size=batch_size),
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+        )
+
+        # Optional two-stage cascade: the small model labels every pair and only
+        # pairs whose top-class probability is below cascade_margin reach model_name.
+        # Defaults come from ARES_NLI_CASCADE (model name) / ARES_NLI_CASCADE_MARGIN.
+        cascade_model = cascade_model or os.environ.get("ARES_NLI_CASCADE") or None
+        self.cascade_margin = cascade_margin if cascade_margin is not None else \
+            float(os.environ.get("ARES_NLI_CASCADE_MARGIN", "0.9"))
+        self.cascade_spec = None
+        self.cascade_scheduler = None
+        if cascade_model:
+            self.cascade_spec = ("nli-pipeline", cascade_model, self.backend)
+            small_spec = self.cascade_spec
+            self.cascade_scheduler = get_scheduler(
+                f"nli:{cascade_model}@{self.backend}",
+                lambda pairs: registry.get(*small_spec)(pairs, batch_size=batch_size),
+                max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+            )
+        self._stats_lock = threading.Lock()
+        self._stats = {"pairs": 0, "escalated": 0, "small_calls": 0, "small_seconds": 0.0,
+                       "large_calls": 0, "large_seconds": 0.0}
+
+    @property
+    def nli_pipeline(self):
+        return registry.get(*self.model_spec)
+
+    @property
+    def model_specs(self) -> List[Tuple[str, str, str]]:
+        return [self.model_spec] + ([self.cascade_spec] if self.cascade_spec else [])
+
+    @staticmethod
+    def _unwrap(prediction):
+        # Pipelines may wrap single predictions in a list depending on top_k
+        if isinstance(prediction, list):
+            return prediction[0] if prediction else None
+        return prediction
+
+    def _timed(self, stage: str, fn, inputs: List[Dict]) -> List:
+        start = time.perf_counter()
+        with span(f"nli_{stage}" if self.cascade_spec else "nli"):
+            results = fn(inputs)
+        with self._stats_lock:
+            self._stats[f"{stage}_calls"] += 1
+            self._stats[f"{stage}_seconds"] += time.perf_counter() - start
+        return results
+
+    def _predict(self, inputs: List[Dict], batch_size: int = None) -> List:
+        """
+        Pipeline predictions for NLI inputs; with a cascade, the small model's
+        label is kept when its top-class probability >= cascade_margin and the
+        pair is escalated to the large model otherwise.
+        """
+        if batch_size:
+            large = lambda xs: self.nli_pipeline(xs, batch_size=batch_size)
+        else:
+            large = self.scheduler.submit
+        if self.cascade_spec is None:
+            results = self._timed("large", large, inputs)
+            with self._stats_lock:
+                self._stats["pairs"] += len(inputs)
+            return results
+
+        if batch_size:
+            small = lambda xs: registry.get(*self.cascade_spec)(xs, batch_size=batch_size)
+        else:
+            small = self.cascade_scheduler.submit
+        results = [self._unwrap(r) for r in self._timed("small", small, inputs)]
+        hard = [i for i, r in enumerate(results) if not r or r.get('score', 0.0) < self.cascade_margin]
+        if hard:
+            for i, r in zip(hard, self._timed("large", large, [inputs[i] for i in hard])):
+                results[i] = r
+        with self._stats_lock:
+            self._stats["pairs"] += len(inputs)
+            self._stats["escalated"] += len(hard)
+        return results
+
+    def stats(self) -> Dict:
+        """
+        Escalation rate and mean latency per call of each cascade stage.
+        """
+        with self._stats_lock:
+            st = dict(self._stats)
+        report = {
+            "cascade_model": self.cascade_spec[1] if self.cascade_spec else None,
+            "cascade_margin": self.cascade_margin if self.cascade_spec else None,
+            "pairs": st["pairs"],
+            "escalated": st["escalated"],
+            "escalation_rate": st["escalated"] / st["pairs"] if self.cascade_spec and st["pairs"] else None,
+        }
+        for stage in ("small", "large"):
+            report[f"{stage}_calls"] = st[f"{stage}_calls"]
+            report[f"{stage}_ms_per_call"] = (1000 * st[f"{stage}_seconds"] / st[f"{stage}_calls"]
+                                              if st[f"{stage}_calls"] else 0.0)
+        return report
+
+    @staticmethod
+    def _is_scorable(claim: str, evidence: str) -> bool:
+        # Empty or trivially short inputs are treated as Neutral without a model call
+        if not evidence.strip() or not claim.strip():
+            return False
+        return len(evidence) >= 5 and len(claim) >= 5
+
+    @staticmethod
+    def _label_to_score(prediction: Dict) -> int:
+        if not prediction:
+            return 0
+        label = prediction['label'].lower()
+        if 'entailment' in label:
+            return 1
+        elif 'contradiction' in label:
+            return -1
+        return 0
 
     def compute(self, claim: str, evidence: str) -> int:
         """
         N(C, E_i) = {+1 (Entailment), 0 (Neutral), -1 (Contradiction)}
         """
-        if not evidence.strip() or not claim.strip():
+        if not self._is_scorable(claim, evidence):
             return 0
             
         try:
-            # Verbose logging for debugging the IndexError: 0
-            if len(evidence) < 5 or len(claim) < 5:
-                return 0
-                
             # Correct MNLI format: premise=evidence, hypothesis=claim
             # Using list of dicts for more robust pipeline processing
-            result = self.nli_pipeline(
+            result = self._predict(
                 [{"text": evidence[:1000], "text_pair": claim[:200]}]
             )
             
             if not result or not result[0]:
                 return 0
                 
-            prediction = result[0]
-            label = prediction['label'].lower()
-            
-            if 'entailment' in label:
-                return 1
-            elif 'contradiction' in label:
-                return -1
-            else:
-                return 0
+            return self._label_to_score(self._unwrap(result[0]))
         except Exception as e:
             import traceback
             print(f"[ERROR] Entailment calculation failed: {e}")
             traceback.print_exc()
             return 0
 
+    def compute_batch(self, claim: str, evidences: List[str], batch_size: int = None) -> List[int]:
+        """
+        [N(C, E_1), ..., N(C, E_M)] in padded forward passes of `batch_size` pairs.
+        Returns the same labels as calling compute() once per passage.
+        """
+        return self.compute_pairs([(claim, e) for e in evidences], batch_size=batch_size)
+
+    def compute_pairs(self, pairs: List[Tuple[str, str]], batch_size: int = None) -> List[int]:
+        """
+        N(C_j, E_i) for arbitrary (claim, evidence) pairs, e.g. the union of
+        pairs across several claims, scored in the same batched pass.
+        """
+        scores = [0] * len(pairs)
+        idx = [i for i, (c, e) in enumerate(pairs) if self._is_scorable(c, e)]
+        if not idx:
+            return scores
+
+        inputs = [{"text": pairs[i][1][:1000], "text_pair": pairs[i][0][:200]} for i in idx]
+        try:
+            results = self._predict(inputs, batch_size=batch_size)
+        except Exception as e:
+            import traceback
+            print(f"[ERROR] Batched entailment calculation failed: {e}")
+            traceback.print_exc()
+            return scores
+
+        for i, prediction in zip(idx, results):
+            scores[i] = self._label_to_score(self._unwrap(prediction))
+        return scores
+
 if __name__ == "__main__":
     eo = EntailmentOperator()
     c = "The moon is made of cheese."
@@ -53,3 +204,8 @@ if __name__ == "__main__":
     print(f"E1: {eo.compute(c, e1)}")
     print(f"E2: {eo.compute(c, e2)}")
     print(f"E3: {eo.compute(c, e3)}")
+    print(f"Batch: {eo.compute_batch(c, [e1, e2, e3])}")
+
+    cascade = EntailmentOperator(cascade_model=CASCADE_MODEL)
+    print(f"Cascade batch: {cascade.compute_batch(c, [e1, e2, e3])}")
+    print(f"Cascade stats: {cascade.stats()}")
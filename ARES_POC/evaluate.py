@@ -1,45 +1,42 @@
 import argparse
 import pandas as pd
 from verifier import Verifier
+from wiki_index import WikiIndex
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import time
+import hashlib
 import json
-import glob
 import os
 
-WIKI_INDEX = {}
+WIKI_INDEX = None
 
-def build_wiki_index(path="wiki-pages/"):
+def build_wiki_index(path="wiki-pages/", index_dir="wiki-index/"):
     """
-    Research Utility: Indexes the FEVER Wikipedia dump (jsonl files).
+    Research Utility: Opens the disk-backed index of the FEVER Wikipedia dump (jsonl files),
+    building it once from `path` if `index_dir` holds no complete index yet.
     Expected format: {"id": "Page_Title", "text": "Sentence 0\nSentence 1..."}
     """
-    if not os.path.exists(path):
-        print(f"WARNING: Wiki path {path} not found. Skipping real index build.")
-        return
+    global WIKI_INDEX
+    if not WikiIndex.exists(index_dir):
+        if not os.path.exists(path):
+            print(f"WARNING: Wiki path {path} not found. Skipping real index build.")
+            return
+        print(f"Building Wiki Index from {path} into {index_dir} (one-time)...")
+        WikiIndex.build(path, index_dir)
         
-    print(f"Building Wiki Index from {path}...")
-    for file in glob.glob(os.path.join(path, "*.jsonl")):
-        with open(file, 'r', encoding='utf-8') as f:
-            for line in f:
-                try:
-                    obj = json.loads(line)
-                    sentences = obj["text"].split("\n")
-                    WIKI_INDEX[obj["id"]] = sentences
-                except:
-                    continue
-    print(f"Index built: {len(WIKI_INDEX)} pages loaded.")
+    WIKI_INDEX = WikiIndex(index_dir)
+    print(f"Index opened: {len(WIKI_INDEX)} pages available.")
 
 def load_wiki_sentence(page_title, line_id):
     """
-    Retrieves the exact gold sentence from the loaded Wikipedia index.
+    Retrieves the exact gold sentence from the disk-backed Wikipedia index.
     """
     try:
         # FEVER page_titles in index match the 'id' field
-        sentences = WIKI_INDEX.get(page_title, [])
-        if line_id < len(sentences):
-            return sentences[line_id]
-        return ""
+        if WIKI_INDEX is None:
+            return ""
+        return WIKI_INDEX.get_sentence(page_title, int(line_id))
     except:
         return ""
 
@@ -76,8 +73,7 @@ def extract_fever_evidence(item):
                 
     return passages
 
-def evaluate_fever(verifier, num_samples=50):
-    print(f"Evaluating on FEVER (sample size: {num_samples}) - ISOLATED FUNCTIONAL MODE")
+def load_fever_samples(num_samples=50):
     try:
         # Research Mirror for FEVER train data (v1.0)
         url = "https://fever.ai/data/train.jsonl"
@@ -98,37 +94,9 @@ def evaluate_fever(verifier, num_samples=50):
                 "evidence": [[ [0,0,"Moon",0] ]]
             }
         ])
-    
-    y_true = []
-    y_pred = []
-    
-    # Iterate through samples
-    for _, item in samples_df.iterrows():
-        claim = item['claim']
-        label = item['label']
-        
-        target = "UNCERTAIN"
-        # FEVER Labels: SUPPORTS, REFUTES, NOT_ENOUGH_INFO
-        if label == "SUPPORTS" or label == 0: target = "VERIFIED"
-        elif label == "REFUTES" or label == 1: target = "MISINFORMATION"
-        elif label == "NOT_ENOUGH_INFO" or label == 2: target = "UNCERTAIN"
-        
-        y_true.append(target)
-        gold_passages = extract_fever_evidence(item)
-        
-        if not gold_passages:
-            y_pred.append("UNCERTAIN")
-            print(f"Claim: {claim[:50]}... | True: {target} | Pred: UNCERTAIN (No gold evidence)")
-            continue
-            
-        result = verifier.verify_with_evidence(claim, gold_passages)
-        y_pred.append(result['verdict'])
-        print(f"Claim: {claim[:50]}... | True: {target} | Pred: {result['verdict']}")
-
-    return calculate_metrics(y_true, y_pred)
+    return samples_df
 
-def evaluate_liar(verifier, num_samples=50):
-    print(f"Evaluating on LIAR (sample size: {num_samples})...")
+def load_liar_samples(num_samples=50):
     try:
         # LIAR Official TSV Mirror (raw format)
         url = "https://raw.githubusercontent.com/Tariq60/LIAR-Dataset/master/train.tsv"
@@ -140,24 +108,194 @@ def evaluate_liar(verifier, num_samples=50):
             {"label": "false", "statement": "The Earth is flat."},
             {"label": "true", "statement": "Water freezes at zero degrees Celsius."}
         ])
+    return samples_df
+
+def fever_target(label):
+    target = "UNCERTAIN"
+    # FEVER Labels: SUPPORTS, REFUTES, NOT_ENOUGH_INFO
+    if label == "SUPPORTS" or label == 0: target = "VERIFIED"
+    elif label == "REFUTES" or label == 1: target = "MISINFORMATION"
+    elif label == "NOT_ENOUGH_INFO" or label == 2: target = "UNCERTAIN"
+    return target
+
+def liar_target(label):
+    target = "UNCERTAIN"
+    if label in ["true", "mostly-true", 2, 3]: target = "VERIFIED"
+    elif label in ["false", "pants-fire", 0, 5]: target = "MISINFORMATION"
+    return target
+
+def predict_fever(verifier, item):
+    claim = item['claim']
+    target = fever_target(item['label'])
     
-    y_true = []
-    y_pred = []
+    gold_passages = extract_fever_evidence(item)
     
-    for _, item in samples_df.iterrows():
-        claim = item['statement']
-        label = item['label']
-        
-        target = "UNCERTAIN"
-        if label in ["true", "mostly-true", 2, 3]: target = "VERIFIED"
-        elif label in ["false", "pants-fire", 0, 5]: target = "MISINFORMATION"
+    if not gold_passages:
+        print(f"Claim: {claim[:50]}... | True: {target} | Pred: UNCERTAIN (No gold evidence)")
+        return target, "UNCERTAIN"
         
-        y_true.append(target)
-        result = verifier.verify(claim)
-        y_pred.append(result['verdict'])
-        print(f"Claim: {claim[:50]}... | True: {target} | Pred: {result['verdict']}")
+    result = verifier.verify_with_evidence(claim, gold_passages)
+    print(f"Claim: {claim[:50]}... | True: {target} | Pred: {result['verdict']}")
+    return target, result['verdict']
+
+def predict_liar(verifier, item):
+    claim = item['statement']
+    target = liar_target(item['label'])
+    
+    result = verifier.verify(claim)
+    print(f"Claim: {claim[:50]}... | True: {target} | Pred: {result['verdict']}")
+    return target, result['verdict']
+
+# Score-once variants: per-passage S, N, W at the largest (k, M) of the sweep
+def score_fever(verifier, item, ks):
+    return fever_target(item['label']), verifier.score_evidence(item['claim'], extract_fever_evidence(item), verifier.m, ks)
+
+def score_liar(verifier, item, ks):
+    passages = verifier.retriever.retrieve(item['statement'], k=verifier.k)
+    return liar_target(item['label']), verifier.score_evidence(item['statement'], passages, verifier.m, ks)
+
+# -------------------------------
+# Sharded, checkpointed benchmark runner
+# Each worker process loads its models once (initializer); every finished claim
+# is appended to a JSONL checkpoint so an interrupted run resumes where it stopped.
+# The first line of a checkpoint fingerprints the verifier configuration; a
+# checkpoint written under other models or thresholds is never resumed.
+# -------------------------------
+DATASETS = {
+    "fever": {"mode": "wiki", "predict": predict_fever, "score": score_fever},
+    "liar": {"mode": "liar", "predict": predict_liar, "score": score_liar},
+}
+
+_WORKER = {}
+
+def _init_worker(dataset, k, m, wiki_index_dir, ks=None, verifier=None):
+    global WIKI_INDEX
+    if dataset == "fever" and WIKI_INDEX is None and WikiIndex.exists(wiki_index_dir):
+        WIKI_INDEX = WikiIndex(wiki_index_dir)
+    _WORKER["dataset"] = dataset
+    _WORKER["ks"] = ks
+    _WORKER["verifier"] = verifier or Verifier(k=k, m=m, mode=DATASETS[dataset]["mode"])
+
+def _predict_shard(shard):
+    task = DATASETS[_WORKER["dataset"]]
+    out = []
+    for item_id, item in shard:
+        try:
+            if _WORKER["ks"] is None:
+                target, pred = task["predict"](_WORKER["verifier"], item)
+                out.append({"id": item_id, "true": target, "pred": pred})
+            else:
+                target, scores = task["score"](_WORKER["verifier"], item, _WORKER["ks"])
+                out.append({"id": item_id, "true": target, "scores": scores, "ks": _WORKER["ks"]})
+        except Exception as e:
+            print(f"[ERROR] Claim {item_id} failed: {e}")
+    return out
+
+def checkpoint_header(verifier, ks=None):
+    config = verifier.config()
+    if ks is not None:
+        # Score-once records only resolve deduplication for these k
+        config["ks"] = ks
+    fingerprint = hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:12]
+    return {"fingerprint": fingerprint, "config": config}
 
-    return calculate_metrics(y_true, y_pred)
+def load_checkpoint(path):
+    """
+    Returns (header, {id: record}); header is None for an empty or legacy checkpoint.
+    """
+    header = None
+    done = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    # A crash can leave a truncated final line
+                    continue
+                if "fingerprint" in rec:
+                    header = rec
+                elif "id" in rec:
+                    done[rec["id"]] = rec
+    return header, done
+
+def run_benchmark(dataset, samples_df, k, m, workers=1, checkpoint_dir="checkpoints/",
+                  wiki_index_dir="wiki-index/", shard_size=4, fresh=False):
+    """
+    Verifies every sample not yet in the checkpoint, across `workers` processes,
+    and returns metrics computed from the merged checkpoint.
+    fresh=True discards the checkpoint and starts over.
+    """
+    merged = _run_shards(dataset, samples_df, k, m, workers, checkpoint_dir, wiki_index_dir, shard_size,
+                         fresh=fresh)
+    return calculate_metrics([r["true"] for r in merged], [r["pred"] for r in merged])
+
+def run_score_once(dataset, samples_df, configs, workers=1, checkpoint_dir="checkpoints/",
+                   wiki_index_dir="wiki-index/", shard_size=4, fresh=False):
+    """
+    Ablation in one pass: scores every claim once at the largest k and M, then
+    derives each config's metrics from the stored S, N, W. Each config may set
+    "theta" (verdict threshold, default 0.4).
+    """
+    k_max = max(c['k'] for c in configs)
+    m_max = max(c['m'] for c in configs)
+    ks = sorted({c['k'] for c in configs})
+    merged = _run_shards(dataset, samples_df, k_max, m_max, workers, checkpoint_dir,
+                         wiki_index_dir, shard_size, ks=ks, fresh=fresh)
+    
+    results = []
+    for config in configs:
+        theta = config.get('theta', 0.4)
+        y_pred = [Verifier.derive_verdict(r["scores"], config['k'], config['m'], theta, r.get("ks"))['verdict']
+                  for r in merged]
+        results.append(calculate_metrics([r["true"] for r in merged], y_pred))
+    return results
+
+def _run_shards(dataset, samples_df, k, m, workers, checkpoint_dir, wiki_index_dir, shard_size, ks=None,
+                fresh=False):
+    if not os.path.exists(checkpoint_dir):
+        os.makedirs(checkpoint_dir)
+    task = f"score_ks{'-'.join(map(str, ks))}_" if ks is not None else ""
+    checkpoint = os.path.join(checkpoint_dir, f"{dataset}_{task}k{k}_m{m}_n{len(samples_df)}.jsonl")
+    if fresh and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    verifier = Verifier(k=k, m=m, mode=DATASETS[dataset]["mode"])
+    header = checkpoint_header(verifier, ks)
+    stored, done = load_checkpoint(checkpoint)
+    if (stored is not None or done) and (stored or {}).get("fingerprint") != header["fingerprint"]:
+        # Resuming would report results of the old models / thresholds as new ones
+        raise RuntimeError(f"{checkpoint} was written with another verifier configuration "
+                           f"({(stored or {}).get('config')}); rerun with --fresh to start over")
+    
+    # Stable ids from the DataFrame index so resumed runs line up with earlier shards
+    items = [(str(idx), item.to_dict()) for idx, item in samples_df.iterrows()]
+    todo = [(i, item) for i, item in items if i not in done]
+    print(f"Evaluating on {dataset.upper()} (sample size: {len(items)}, resumed: {len(items) - len(todo)}, workers: {workers})")
+    shards = [todo[s:s + shard_size] for s in range(0, len(todo), shard_size)]
+    
+    with open(checkpoint, 'a', encoding='utf-8') as ckpt:
+        if stored is None:
+            ckpt.write(json.dumps(header) + "\n")
+
+        def record(results):
+            for rec in results:
+                ckpt.write(json.dumps(rec) + "\n")
+                done[rec["id"]] = rec
+            ckpt.flush()
+            os.fsync(ckpt.fileno())
+        
+        if workers <= 1:
+            _init_worker(dataset, k, m, wiki_index_dir, ks, verifier)
+            for shard in shards:
+                record(_predict_shard(shard))
+        elif shards:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(dataset, k, m, wiki_index_dir, ks)) as pool:
+                for future in as_completed([pool.submit(_predict_shard, s) for s in shards]):
+                    record(future.result())
+    
+    return [done[i] for i, _ in items if i in done]
 
 def calculate_metrics(y_true, y_pred):
     labels = ["VERIFIED", "MISINFORMATION", "UNCERTAIN"]
@@ -175,11 +313,19 @@ def main():
     parser = argparse.ArgumentParser(description="Evaluate ARES_POC on benchmarks")
     parser.add_argument("--dataset", type=str, choices=["fever", "liar", "both"], default="both")
     parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--wiki-dir", type=str, default="wiki-pages/")
+    parser.add_argument("--wiki-index", type=str, default="wiki-index/")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (each loads the models once)")
+    parser.add_argument("--checkpoint-dir", type=str, default="checkpoints/", help="Per-claim results for resuming")
+    parser.add_argument("--score-once", action="store_true",
+                        help="Score at the largest k/M once and derive every configuration from it")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Discard existing checkpoints instead of resuming them")
     
     args = parser.parse_args()
     
     # Initialize Wiki Index for FEVER
-    build_wiki_index("wiki-pages/")
+    build_wiki_index(args.wiki_dir, args.wiki_index)
     
     if args.dataset in ["fever", "both"] and not WIKI_INDEX:
         print("ERROR: FEVER wiki index not loaded. Evaluation invalid.")
@@ -195,22 +341,35 @@ def main():
     
     all_results = []
     
-    for config in configs:
-        print(f"\n>>> Running configuration: k={config['k']}, m={config['m']}")
-        
-        row = {"k": config['k'], "m": config['m']}
-        
-        if args.dataset in ["fever", "both"]:
-            verifier = Verifier(k=config['k'], m=config['m'], mode="wiki")
-            fever_res = evaluate_fever(verifier, args.samples)
-            row["fever_f1"] = fever_res['f1']
+    # Samples are loaded once and shared by every configuration
+    samples = {}
+    if args.dataset in ["fever", "both"]:
+        samples["fever"] = load_fever_samples(args.samples)
+    if args.dataset in ["liar", "both"]:
+        samples["liar"] = load_liar_samples(args.samples)
+    
+    if args.score_once:
+        print(f"\n>>> Score-once ablation over {len(configs)} configurations")
+        all_results = [{"k": c['k'], "m": c['m']} for c in configs]
+        for dataset, samples_df in samples.items():
+            res = run_score_once(dataset, samples_df, configs, workers=args.workers,
+                                 checkpoint_dir=args.checkpoint_dir, wiki_index_dir=args.wiki_index,
+                                 fresh=args.fresh)
+            for row, r in zip(all_results, res):
+                row[f"{dataset}_f1"] = r['f1']
+    else:
+        for config in configs:
+            print(f"\n>>> Running configuration: k={config['k']}, m={config['m']}")
             
-        if args.dataset in ["liar", "both"]:
-            verifier = Verifier(k=config['k'], m=config['m'], mode="liar")
-            liar_res = evaluate_liar(verifier, args.samples)
-            row["liar_f1"] = liar_res['f1']
+            row = {"k": config['k'], "m": config['m']}
             
-        all_results.append(row)
+            for dataset, samples_df in samples.items():
+                res = run_benchmark(dataset, samples_df, config['k'], config['m'],
+                                    workers=args.workers, checkpoint_dir=args.checkpoint_dir,
+                                    wiki_index_dir=args.wiki_index, fresh=args.fresh)
+                row[f"{dataset}_f1"] = res['f1']
+                
+            all_results.append(row)
         
     print("\n--- ABLATION STUDY TABLE ---")
     df = pd.DataFrame(all_results)
@@ -0,0 +1,126 @@
+# CPU inference backends for the S(C,E) and N(C,E) models.
+#   fp32 - full-precision PyTorch (reference)
+#   int8 - PyTorch with dynamic int8 quantization of every nn.Linear
+#   onnx - exported ONNX graph run by onnxruntime (needs optimum[onnxruntime])
+# Selected per operator (backend=...) or via ARES_EMBED_BACKEND / ARES_NLI_BACKEND.
+# Running this module checks label/ranking parity of a backend against fp32.
+
+import argparse
+import json
+import os
+import time
+
+BACKENDS = ("fp32", "int8", "onnx")
+
+def resolve_backend(backend: str, env_var: str) -> str:
+    backend = backend or os.environ.get(env_var, "fp32")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}' (expected one of {BACKENDS})")
+    return backend
+
+def _quantize_int8(module):
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+def load_sentence_transformer(name: str, backend: str = "fp32"):
+    from sentence_transformers import SentenceTransformer
+    if backend == "onnx":
+        # sentence-transformers >= 3.2 exports/loads the ONNX graph itself
+        return SentenceTransformer(name, backend="onnx")
+    model = SentenceTransformer(name)
+    if backend == "int8":
+        model = _quantize_int8(model)
+    return model
+
+def load_nli_pipeline(name: str, backend: str = "fp32"):
+    from transformers import pipeline
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSequenceClassification
+        except ImportError:
+            raise RuntimeError("The onnx backend needs: pip install optimum[onnxruntime]")
+        from transformers import AutoTokenizer
+        # Export once; later processes load the saved graph
+        export_dir = os.path.join("cache", "onnx", name.replace('/', '__'))
+        if os.path.exists(os.path.join(export_dir, "model.onnx")):
+            model = ORTModelForSequenceClassification.from_pretrained(export_dir)
+        else:
+            model = ORTModelForSequenceClassification.from_pretrained(name, export=True)
+            model.save_pretrained(export_dir)
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        return pipeline("text-classification", model=model, tokenizer=tokenizer, device=-1)
+    nli = pipeline("text-classification", model=name, device=-1) # CPU for reproducibility in small env
+    if backend == "int8":
+        nli.model = _quantize_int8(nli.model)
+    return nli
+
+# -------------------------------
+# Parity check against fp32
+# -------------------------------
+PARITY_SET = [
+    ("The Earth orbits the Sun.", "The Earth completes one orbit around the Sun every year."),
+    ("The Earth orbits the Sun.", "The Sun orbits the Earth once a day."),
+    ("The moon is made of green cheese.", "The Moon is composed of silicate rock and metal."),
+    ("The moon is made of green cheese.", "Cheese is produced from milk in many countries."),
+    ("Water freezes at zero degrees Celsius.", "At standard pressure, water freezes at 0 °C."),
+    ("Water freezes at zero degrees Celsius.", "Water boils at 100 degrees Celsius at sea level."),
+    ("Narendra Modi is the Prime Minister of India.", "Narendra Modi was sworn in as Prime Minister of India."),
+    ("Narendra Modi is the Prime Minister of India.", "The President of India is the head of state."),
+    ("The population of Mars is 1 billion.", "Mars has no permanent human population."),
+    ("The Great Wall of China is visible from space with the naked eye.", "Astronauts report the Great Wall is not visible to the naked eye from orbit."),
+    ("Vaccines cause autism.", "Large studies have found no link between vaccines and autism."),
+    ("The WHO is headquartered in Geneva.", "The World Health Organization has its headquarters in Geneva, Switzerland."),
+]
+
+def check_parity(backend: str, pairs=None, nli_model: str = 'facebook/bart-large-mnli',
+                 embed_model: str = 'all-MiniLM-L6-v2') -> dict:
+    """
+    Runs the fixed claim/evidence set through fp32 and `backend` and reports
+    NLI label agreement, embedding cosine agreement and per-backend latency.
+    """
+    from entailment import EntailmentOperator
+    from similarity import SimilarityFilter
+    import numpy as np
+
+    pairs = pairs or PARITY_SET
+    report = {"backend": backend, "pairs": len(pairs)}
+    outputs = {}
+    for b in ("fp32", backend):
+        eo = EntailmentOperator(model_name=nli_model, backend=b)
+        sf = SimilarityFilter(model_name=embed_model, backend=b, use_cache=False)
+        eo.compute_pairs(pairs[:1])  # warm-up: load and first-call overhead
+        start = time.perf_counter()
+        labels = eo.compute_pairs(pairs)
+        nli_s = time.perf_counter() - start
+        texts = [t for pair in pairs for t in pair]
+        start = time.perf_counter()
+        vectors = sf.encode(texts)
+        embed_s = time.perf_counter() - start
+        outputs[b] = (labels, vectors)
+        report[f"{b}_nli_ms_per_pair"] = 1000 * nli_s / len(pairs)
+        report[f"{b}_embed_ms_per_text"] = 1000 * embed_s / len(texts)
+
+    ref_labels, ref_vecs = outputs["fp32"]
+    labels, vecs = outputs[backend]
+    report["label_agreement"] = sum(a == b for a, b in zip(ref_labels, labels)) / len(pairs)
+    report["label_mismatches"] = [
+        {"claim": c, "evidence": e, "fp32": a, backend: b}
+        for (c, e), a, b in zip(pairs, ref_labels, labels) if a != b
+    ]
+    ref_n = ref_vecs / np.linalg.norm(ref_vecs, axis=1, keepdims=True)
+    new_n = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    report["embedding_min_cosine"] = float(np.min(np.sum(ref_n * new_n, axis=1)))
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check an inference backend against fp32")
+    parser.add_argument("--backend", type=str, choices=BACKENDS, default="int8")
+    parser.add_argument("--pairs", type=str, default=None,
+                        help="Optional JSONL of {\"claim\", \"evidence\"} to use instead of the built-in set")
+    args = parser.parse_args()
+
+    pairs = None
+    if args.pairs:
+        with open(args.pairs, 'r', encoding='utf-8') as f:
+            pairs = [(o["claim"], o["evidence"]) for o in map(json.loads, f) if o]
+    print(json.dumps(check_parity(args.backend, pairs), indent=2))
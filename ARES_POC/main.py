@@ -7,6 +7,16 @@ def main():
     parser.add_argument("claim", type=str, help="The claim to verify")
     parser.add_argument("--k", type=int, default=10, help="Retrieval depth (R operator)")
     parser.add_argument("--m", type=int, default=5, help="Top-M selection (S operator)")
+    parser.add_argument("--backend", type=str, choices=["fp32", "int8", "onnx"], default=None,
+                        help="CPU inference backend for S and N (default: fp32)")
+    parser.add_argument("--early-exit", action="store_true",
+                        help="Skip N(C,E) calls once the verdict can no longer change")
+    parser.add_argument("--cascade", type=str, nargs="?", const="cross-encoder/nli-MiniLM2-L6-H768", default=None,
+                        help="Small MNLI model run first; only uncertain pairs reach bart-large")
+    parser.add_argument("--cascade-margin", type=float, default=None,
+                        help="Top-class probability below which a pair is escalated (default: 0.9)")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="MinHash Jaccard above which passages are collapsed (negative disables)")
     
     args = parser.parse_args()
     
@@ -15,7 +25,9 @@ def main():
     print(f"Parameters: k={args.k}, m={args.m}")
     print(f"------------------------------\n")
     
-    verifier = Verifier(k=args.k, m=args.m)
+    verifier = Verifier(k=args.k, m=args.m, backend=args.backend, early_exit=args.early_exit,
+                        cascade_model=args.cascade, cascade_margin=args.cascade_margin,
+                        dedup_threshold=args.dedup_threshold if args.dedup_threshold >= 0 else None)
     result = verifier.verify(args.claim)
     
     print(json.dumps(result, indent=2))
@@ -23,6 +35,8 @@ def main():
     print(f"\nFINAL VERDICT: {result['verdict']}")
     print(f"TRUTH SCORE: {result['truth_score']:.4f}")
     print(f"CONFIDENCE: {result['confidence']:.4f}")
+    if args.cascade:
+        print(f"NLI CASCADE: {json.dumps(verifier.entailment.stats())}")
 
 if __name__ == "__main__":
     main()
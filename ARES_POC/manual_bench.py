@@ -19,30 +19,33 @@ def main():
         {"k": 10, "theta": 0.7}
     ]
     
-    all_results = []
+    # Score once at the largest k; every (k, theta) row is derived from the stored S, N, W
+    k_max = max(c['k'] for c in configs)
+    ks = sorted({c['k'] for c in configs})
+    verifier = Verifier(k=k_max)
+    correct = {i: 0 for i in range(len(configs))}
+    total = len(test_claims)
     
-    for config in configs:
-        print(f"\n>>> Evaluating configuration: k={config['k']}, theta={config['theta']}")
-        verifier = Verifier(k=config['k'], theta=config['theta'])
-        
-        correct = 0
-        total = len(test_claims)
-        
-        for claim, ground_truth in test_claims:
-            print(f"Testing: {claim[:30]}...")
-            try:
-                res = verifier.verify(claim)
-                if res['verdict'] == ground_truth:
-                    correct += 1
-                print(f"  Result: {res['verdict']} | GT: {ground_truth}")
-            except Exception as e:
-                print(f"  Error: {e}")
-        
-        accuracy = correct / total
+    for claim, ground_truth in test_claims:
+        print(f"Testing: {claim[:30]}...")
+        try:
+            passages = verifier.retriever.retrieve(claim, k=k_max)
+            scores = verifier.score_evidence(claim, passages, verifier.m, ks)
+        except Exception as e:
+            print(f"  Error: {e}")
+            continue
+        for i, config in enumerate(configs):
+            res = Verifier.derive_verdict(scores, config['k'], verifier.m, config['theta'], ks)
+            if res['verdict'] == ground_truth:
+                correct[i] += 1
+            print(f"  k={config['k']}, theta={config['theta']} | Result: {res['verdict']} | GT: {ground_truth}")
+    
+    all_results = []
+    for i, config in enumerate(configs):
         all_results.append({
             "k": config['k'],
             "theta": config['theta'],
-            "accuracy": accuracy
+            "accuracy": correct[i] / total
         })
         
     print("\n--- ARES_POC MANUAL ABLATION TABLE ---")
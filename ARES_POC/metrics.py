@@ -0,0 +1,164 @@
+# Per-stage timing instrumentation.
+# span("stage") times a block of pipeline work; every span feeds a process-wide
+# latency histogram, and, while a request collector is active (collect_timings()),
+# also that request's `timings` block. render_prometheus() serves the histograms
+# and the cache counters in Prometheus text format.
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("ares_timings", default=None)
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+class Timings:
+    """
+    Per-request stage totals: {stage: {"seconds": total, "count": spans}}.
+    Spans may close on several threads (page fetches), hence the lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "count": 0})
+            entry["seconds"] += seconds
+            entry["count"] += 1
+
+    def update(self, stages: Dict[str, Dict]) -> None:
+        """Adds the totals of another as_dict() block."""
+        with self._lock:
+            for stage, v in stages.items():
+                entry = self.stages.setdefault(stage, {"seconds": 0.0, "count": 0})
+                entry["seconds"] += v["seconds"]
+                entry["count"] += v["count"]
+
+    def as_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {stage: dict(v) for stage, v in self.stages.items()}
+
+_histograms: Dict[str, Histogram] = {}
+_hist_lock = threading.Lock()
+# name -> callable returning {"hits", "misses", ...}; polled at scrape time
+_cache_sources = {}
+
+def record(stage: str, seconds: float) -> None:
+    with _hist_lock:
+        hist = _histograms.get(stage)
+        if hist is None:
+            hist = _histograms[stage] = Histogram()
+        hist.observe(seconds)
+    timings = _current.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+@contextmanager
+def span(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+@contextmanager
+def collect_timings():
+    """
+    Yields the active request's Timings, starting one if none is active
+    (nested calls, e.g. verify -> verify_with_evidence, share the outer one).
+    """
+    timings = _current.get()
+    if timings is not None:
+        yield timings
+        return
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+def in_context(fn):
+    """
+    Wraps fn to run inside a copy of the caller's context, so spans it closes on
+    another thread (e.g. a fetch pool worker) land in the caller's request timings.
+    """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+def register_cache(name: str, stats_fn) -> None:
+    _cache_sources[name] = stats_fn
+
+def render_prometheus(gauges: Dict[str, Dict[str, float]] = None) -> str:
+    lines: List[str] = [
+        "# HELP ares_stage_duration_seconds Latency of pipeline stages.",
+        "# TYPE ares_stage_duration_seconds histogram",
+    ]
+    with _hist_lock:
+        for stage in sorted(_histograms):
+            h = _histograms[stage]
+            cumulative = 0
+            for upper, n in zip(h.buckets, h.counts):
+                cumulative += n
+                lines.append(f'ares_stage_duration_seconds_bucket{{stage="{stage}",le="{upper}"}} {cumulative}')
+            lines.append(f'ares_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+            lines.append(f'ares_stage_duration_seconds_sum{{stage="{stage}"}} {h.sum}')
+            lines.append(f'ares_stage_duration_seconds_count{{stage="{stage}"}} {h.count}')
+
+    cache_stats = {}
+    for name, stats_fn in list(_cache_sources.items()):
+        try:
+            cache_stats[name] = stats_fn()
+        except Exception as e:
+            print(f"[ERROR] Cache stats for {name} failed: {e}")
+    for metric, help_text in (("hits", "Cache hits."), ("misses", "Cache misses.")):
+        lines.append(f"# HELP ares_cache_{metric}_total {help_text}")
+        lines.append(f"# TYPE ares_cache_{metric}_total counter")
+        for name in sorted(cache_stats):
+            if metric in cache_stats[name]:
+                lines.append(f'ares_cache_{metric}_total{{cache="{name}"}} {cache_stats[name][metric]}')
+    lines.append("# HELP ares_cache_entries Entries currently held by each cache.")
+    lines.append("# TYPE ares_cache_entries gauge")
+    for name in sorted(cache_stats):
+        if "entries" in cache_stats[name]:
+            lines.append(f'ares_cache_entries{{cache="{name}"}} {cache_stats[name]["entries"]}')
+
+    # gauges: metric -> {label set, e.g. 'scheduler="nli"' or '': value}
+    for name in sorted(gauges or {}):
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in sorted(gauges[name].items()):
+            lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def profiled(fn, *args, limit: int = 30, **kwargs):
+    """
+    Runs fn under cProfile (calling thread only) and returns (result, report), the
+    report listing the `limit` most expensive functions by cumulative time.
+    """
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    result = profiler.runcall(fn, *args, **kwargs)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return result, out.getvalue()
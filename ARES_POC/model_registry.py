@@ -0,0 +1,84 @@
+# Process-wide registry for the S(C,E) and N(C,E) models.
+# Models are loaded lazily on first use (never at import time), exactly once per
+# process even under concurrent first calls, and can be preloaded or unloaded
+# explicitly. Operators and every Verifier share the same instances.
+# Each model is keyed by (kind, name, backend); see inference_backends.py.
+
+import gc
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from inference_backends import load_nli_pipeline, load_sentence_transformer
+
+class ModelRegistry:
+    def __init__(self):
+        self._loaders: Dict[str, Callable] = {
+            "sentence-transformer": load_sentence_transformer,
+            "nli-pipeline": load_nli_pipeline,
+        }
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register_loader(self, kind: str, loader: Callable) -> None:
+        with self._lock:
+            self._loaders[kind] = loader
+
+    def get(self, kind: str, name: str, backend: str = "fp32"):
+        """
+        Returns the shared model instance, loading it on first use.
+        """
+        key = (kind, name, backend)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        # Per-model lock: concurrent first calls load once, other models load in parallel
+        with key_lock:
+            if key not in self._models:
+                print(f"[INFO] Loading {kind} model '{name}' ({backend})")
+                self._models[key] = self._loaders[kind](name, backend)
+            return self._models[key]
+
+    def preload(self, specs: List[Tuple[str, str, str]]) -> None:
+        for spec in specs:
+            self.get(*spec)
+
+    def unload(self, kind: str = None, name: str = None, backend: str = None) -> int:
+        """
+        Drops matching models (all when no filter is given); they reload on next use.
+        """
+        with self._lock:
+            keys = [k for k in self._models
+                    if (kind is None or k[0] == kind) and (name is None or k[1] == name)
+                    and (backend is None or k[2] == backend)]
+            for k in keys:
+                del self._models[k]
+        gc.collect()
+        return len(keys)
+
+    def loaded(self) -> List[Tuple[str, str, str]]:
+        return list(self._models)
+
+    def freeze(self) -> int:
+        """
+        Puts every loaded torch model in eval mode with requires_grad off, so
+        inference never builds autograd state and the weights are never written
+        (serve.py's forked workers share them copy-on-write).
+        Returns the number of modules frozen; ONNX sessions are skipped.
+        """
+        import torch
+        frozen = 0
+        with self._lock:
+            models = list(self._models.values())
+        for model in models:
+            # SentenceTransformer is a Module; a transformers pipeline wraps one in .model
+            module = model if isinstance(model, torch.nn.Module) else getattr(model, "model", None)
+            if isinstance(module, torch.nn.Module):
+                module.eval()
+                module.requires_grad_(False)
+                frozen += 1
+        return frozen
+
+registry = ModelRegistry()
@@ -0,0 +1,91 @@
+# Append-only passage store shared by the local retrieval indexes.
+#   passages.jsonl - one {"text", "url"} object per passage id
+#   offsets.u64    - byte offset of every line (n_passages + 1), memory-mapped
+# Reading passage i is one seek and one read, whatever the corpus size.
+# Also holds the read side shared by the on-disk indexes (dense, sparse, wiki):
+# lazily opened memory maps and per-thread read-only SQLite connections.
+
+import json
+import os
+import sqlite3
+import struct
+import threading
+from typing import Callable, Dict
+
+import numpy as np
+
+def map_array(path: str, dtype, shape=None) -> np.ndarray:
+    # np.memmap refuses empty files
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+class LazyMaps:
+    """
+    The arrays returned by `loader`, opened on first use so forked workers map
+    after the fork rather than inheriting the parent's mappings.
+    """
+    def __init__(self, loader: Callable[[], Dict[str, np.ndarray]]):
+        self._loader = loader
+        self._maps = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Dict[str, np.ndarray]:
+        if self._maps is None:
+            with self._lock:
+                if self._maps is None:
+                    self._maps = self._loader()
+        return self._maps
+
+class ReadOnlyDB:
+    """
+    One read-only SQLite connection per thread (connections may not be shared
+    across threads).
+    """
+    def __init__(self, path: str):
+        self.uri = "file:" + os.path.abspath(path) + "?mode=ro"
+        self._local = threading.local()
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.uri, uri=True)
+        return conn
+
+class PassageWriter:
+    def __init__(self, directory: str):
+        self._pf = open(os.path.join(directory, "passages.jsonl"), 'wb')
+        self._of = open(os.path.join(directory, "offsets.u64"), 'wb')
+        self._of.write(struct.pack('<Q', 0))
+        self.count = 0
+
+    def add(self, passage: Dict[str, str]) -> int:
+        line = (json.dumps({"text": passage['text'], "url": passage.get('url', '')}) + "\n").encode('utf-8')
+        self._pf.write(line)
+        self._of.write(struct.pack('<Q', self._pf.tell()))
+        self.count += 1
+        return self.count - 1
+
+    def close(self):
+        self._pf.close()
+        self._of.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class PassageStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._maps = LazyMaps(lambda: {
+            "offsets": map_array(os.path.join(directory, "offsets.u64"), '<u8'),
+        })
+
+    def __getitem__(self, pid: int) -> Dict[str, str]:
+        offsets = self._maps.get()["offsets"]
+        start, end = int(offsets[pid]), int(offsets[pid + 1])
+        with open(os.path.join(self.directory, "passages.jsonl"), 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(end - start).decode('utf-8'))
@@ -0,0 +1,331 @@
+# Offline performance benchmarks for the ARES pipeline.
+# Micro-benchmarks time the operators at several passage counts; the end-to-end
+# run verifies claims in web mode against a local fake search/page server, so no
+# network is needed. --stub-models swaps S and N for tiny deterministic stand-ins.
+# Results are written as JSON and can be compared against a stored baseline:
+#   py perf_bench.py --stub-models --output bench.json
+#   py perf_bench.py --stub-models --baseline bench.json --threshold 0.2
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# Run from the repository directory regardless of the working directory chosen below
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# -------------------------------
+# Stand-in models
+# -------------------------------
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_NEGATIONS = frozenset("no not never none cannot".split())
+
+class StubEncoder:
+    """
+    Hashed bag-of-words (+ bigrams) embedding with the MiniLM output shape.
+    """
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts: List[str], convert_to_numpy: bool = True) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            for gram in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                out[row, zlib.crc32(gram.encode('utf-8')) % self.dim] += 1.0
+        return out / np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+
+class StubNLI:
+    """
+    Pipeline-compatible NLI stand-in: claim-token overlap with the evidence
+    decides entailment, a negation mismatch turns it into contradiction.
+    """
+    def __call__(self, inputs: List[Dict[str, str]], batch_size: int = 8) -> List[Dict]:
+        results = []
+        for x in inputs:
+            premise = set(_WORD_RE.findall(x["text"].lower()))
+            hypothesis = set(_WORD_RE.findall(x["text_pair"].lower()))
+            overlap = len(premise & hypothesis) / max(1, len(hypothesis))
+            negated = bool(premise & _NEGATIONS) != bool(hypothesis & _NEGATIONS)
+            if overlap >= 0.6:
+                label = "CONTRADICTION" if negated else "ENTAILMENT"
+            else:
+                label = "NEUTRAL"
+            results.append({"label": label, "score": 0.5 + overlap / 2})
+        return results
+
+def use_stub_models() -> None:
+    from model_registry import registry
+    registry.register_loader("sentence-transformer", lambda name, backend="fp32": StubEncoder())
+    registry.register_loader("nli-pipeline", lambda name, backend="fp32": StubNLI())
+
+# -------------------------------
+# Synthetic corpus
+# -------------------------------
+_SUBJECTS = ["The river", "The council", "The satellite", "The vaccine", "The bridge", "The ministry",
+             "The festival", "The reactor", "The museum", "The railway", "The glacier", "The library"]
+_VERBS = ["was completed in", "was approved by", "is located near", "was funded by", "is operated by",
+          "was launched from", "is monitored by", "was renamed after"]
+_OBJECTS = ["the northern province", "a regional authority", "the national agency", "an international consortium",
+            "the old harbour", "a university laboratory", "the capital city", "a private foundation"]
+_DOMAINS = ["who.int", "reuters.com", "news.un.org", "randomblog.xyz", "example-news.com",
+            "myblog.wordpress.com", "data.gov.in", "apnews.com", "unknown-site.info", "bbc.com"]
+
+def synthetic_sentence(rng: random.Random) -> str:
+    return (f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} "
+            f"in {rng.randint(1950, 2024)} according to officials familiar with the matter.")
+
+def synthetic_passages(n: int, seed: int = 0) -> List[Dict[str, str]]:
+    rng = random.Random(seed)
+    return [{"text": synthetic_sentence(rng), "url": f"https://{rng.choice(_DOMAINS)}/article/{i}"}
+            for i in range(n)]
+
+def synthetic_claims(n: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [synthetic_sentence(rng).split(" according")[0] + "." for _ in range(n)]
+
+def synthetic_page(page_id: int, sentences: int = 40) -> str:
+    rng = random.Random(page_id)
+    body = "".join(f"<p>{synthetic_sentence(rng)} {synthetic_sentence(rng)}</p>"
+                   f"<script>var t{i} = '{synthetic_sentence(rng)}';</script>" for i in range(sentences // 2))
+    return (f"<html><head><title>Page {page_id}</title><style>p {{ margin: 0 }}</style></head><body>"
+            f"<nav>Home | News | About</nav>{body}</body></html>")
+
+# -------------------------------
+# Local fake search / page server
+# -------------------------------
+class _FakeWebHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    pages = 50
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if self.latency:
+            time.sleep(self.latency)
+        if parsed.path == "/search":
+            q = parse_qs(parsed.query)
+            k = int(q.get("k", ["10"])[0])
+            start = zlib.crc32(q.get("q", [""])[0].encode('utf-8')) % self.pages
+            host = f"http://{self.headers['Host']}"
+            hits = [{"href": f"{host}/page/{(start + i) % self.pages}", "title": f"Page {(start + i) % self.pages}"}
+                    for i in range(k)]
+            self._send(200, "application/json", json.dumps(hits).encode('utf-8'))
+        elif parsed.path.startswith("/page/"):
+            self._send(200, "text/html; charset=utf-8", synthetic_page(int(parsed.path.rsplit('/', 1)[1])).encode('utf-8'))
+        else:
+            self._send(404, "text/plain", b"not found")
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_fake_web(latency_ms: float = 0.0) -> ThreadingHTTPServer:
+    handler = type("FakeWebHandler", (_FakeWebHandler,), {"latency": latency_ms / 1000.0})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def local_search_retriever(base_url: str, **kwargs):
+    """
+    A web-mode Retriever whose search hits come from the fake server.
+    """
+    import requests
+    from retriever import Retriever
+
+    class LocalSearchRetriever(Retriever):
+        def _search(self, claim: str, k: int) -> List[Dict[str, str]]:
+            return requests.get(f"{base_url}/search", params={"q": claim, "k": k}, timeout=10).json()
+
+    return LocalSearchRetriever(mode="web", **kwargs)
+
+# -------------------------------
+# Timing helpers
+# -------------------------------
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples) * 1000.0
+    return {
+        "runs": len(samples),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "min_ms": float(ms.min()),
+    }
+
+def time_it(fn: Callable, repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+# -------------------------------
+# Benchmarks
+# -------------------------------
+def micro_benchmarks(sizes: List[int], repeat: int) -> Dict[str, Dict]:
+    from similarity import SimilarityFilter
+    from entailment import EntailmentOperator
+    from credibility import CredibilityWeight
+    from verifier import Verifier
+
+    results = {}
+    claim = synthetic_claims(1)[0]
+    # Embedding store off: every run measures model work, not cache hits
+    similarity = SimilarityFilter(use_cache=False)
+    entailment = EntailmentOperator()
+    credibility = CredibilityWeight()
+    verifier = Verifier(mode="liar")
+    verifier.similarity = similarity
+
+    results["entailment.compute"] = time_it(
+        lambda: entailment.compute(claim, synthetic_passages(1)[0]['text']), repeat)
+    urls = [p['url'] for p in synthetic_passages(1000)]
+    results["credibility.calculate[x1000]"] = time_it(lambda: [credibility.calculate(u) for u in urls], repeat)
+    retriever = verifier.retriever
+    page_text = retriever._extract_text(synthetic_page(0, sentences=400))
+    results["retriever._split_into_passages"] = time_it(lambda: retriever._split_into_passages(page_text), repeat)
+
+    for n in sizes:
+        passages = synthetic_passages(n, seed=n)
+        texts = [p['text'] for p in passages]
+        results[f"similarity.rank[n={n}]"] = time_it(lambda: similarity.rank(claim, passages, m=5), repeat)
+        results[f"entailment.compute_batch[n={n}]"] = time_it(lambda: entailment.compute_batch(claim, texts), repeat)
+        results[f"verifier.verify_with_evidence[n={n}]"] = time_it(
+            lambda: verifier.verify_with_evidence(claim, passages, m=5), repeat)
+    return results
+
+def end_to_end(claims: int, concurrency: int, latency_ms: float, k: int, m: int) -> Dict[str, Dict]:
+    from verifier import Verifier
+
+    server = start_fake_web(latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        verifier = Verifier(k=k, m=m, mode="web")
+        verifier.retriever = local_search_retriever(base_url, k=k, cache_dir="cache-e2e")
+        batch = synthetic_claims(claims, seed=7)
+        verifier.verify(batch[0])  # warm-up: model load, connection pool
+
+        latencies = []
+        lock = threading.Lock()
+        def run(claim: str) -> None:
+            start = time.perf_counter()
+            verifier.verify(claim)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(run, batch[1:]))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    ms = np.asarray(latencies) * 1000.0
+    return {f"e2e.verify[c={concurrency}]": {
+        "runs": len(latencies),
+        "throughput_claims_per_s": len(latencies) / elapsed,
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }}
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    Benchmarks whose mean or p95 latency grew by more than `threshold`
+    (fraction) over the baseline, or whose throughput fell by more than it.
+    """
+    regressions = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            continue
+        for metric in ("mean_ms", "p95_ms"):
+            if metric in base and base[metric] > 0 and cur[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name} {metric}: {base[metric]:.3f} -> {cur[metric]:.3f}")
+        metric = "throughput_claims_per_s"
+        if metric in base and cur[metric] < base[metric] * (1 - threshold):
+            regressions.append(f"{name} {metric}: {base[metric]:.2f} -> {cur[metric]:.2f}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ARES performance benchmarks")
+    parser.add_argument("--stub-models", action="store_true", help="Use tiny stand-in models for S and N")
+    parser.add_argument("--sizes", type=str, default="10,50,200", help="Passage counts for micro-benchmarks")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--claims", type=int, default=50, help="Claims in the end-to-end run")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Fake server response delay")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--m", type=int, default=5)
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--output", type=str, default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", type=str, default=None, help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    if args.stub_models:
+        use_stub_models()
+    # Fresh working directory: no retrieval, page or embedding cache from earlier runs
+    os.chdir(tempfile.mkdtemp(prefix="ares-bench-"))
+
+    # The pipeline's [DEBUG]/[INFO] lines are silenced while timing
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = micro_benchmarks([int(n) for n in args.sizes.split(",")], args.repeat)
+        if not args.skip_e2e:
+            results.update(end_to_end(args.claims, args.concurrency, args.latency_ms, args.k, args.m))
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub_models": args.stub_models,
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    for name, r in report["results"].items():
+        extra = f" | {r['throughput_claims_per_s']:.1f} claims/s" if "throughput_claims_per_s" in r else ""
+        print(f"{name:45s} mean {r['mean_ms']:9.3f} ms | p95 {r['p95_ms']:9.3f} ms{extra}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"[ERROR] {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"[INFO] No regressions beyond {args.threshold:.0%} against {baseline_path}")
@@ -0,0 +1,130 @@
+# Semantic cache of final V(C) results for the API.
+# Incoming claims are embedded with the S(C,E) model and matched against an
+# in-memory matrix of recently verified claims; a paraphrase whose cosine
+# similarity reaches the threshold (and that agrees on negations and numbers)
+# gets the stored verdict and trace without retrieval or NLI.
+# Entries expire after `ttl` seconds and the least recently used entry is
+# evicted once `max_entries` is reached.
+
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+NEGATIONS = frozenset("no not never none nobody nothing neither nor cannot".split())
+
+def _guard_tokens(claim: str) -> Tuple[frozenset, frozenset]:
+    # Paraphrases embed close to claims with the opposite polarity or different
+    # figures, so negations and numbers must match exactly for a hit
+    tokens = _TOKEN_RE.findall(claim.lower().replace("n't", " not"))
+    return frozenset(t for t in tokens if t in NEGATIONS), frozenset(t for t in tokens if t.isdigit())
+
+class ClaimResultCache:
+    def __init__(self, encoder, threshold: float = 0.9, ttl: float = 3600,
+                 max_entries: int = 10000):
+        # encoder: a SimilarityFilter, so claim embeddings share its model and embedding store
+        self.encoder = encoder
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = None                 # (max_entries, dim), unit rows
+        self._entries = [None] * max_entries  # slot -> entry dict or None
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _embed(self, claim: str) -> np.ndarray:
+        v = self.encoder.encode([claim])[0].astype(np.float32)
+        return v / max(float(np.linalg.norm(v)), 1e-12)
+
+    def _drop(self, slot: int) -> None:
+        self._entries[slot] = None
+        self._valid[slot] = False
+        self._free.append(slot)
+
+    def get(self, claim: str, params: tuple) -> Optional[Dict]:
+        """
+        Stored result for the most similar cached claim verified with the same
+        params, if cos(C, C_cached) >= threshold; None otherwise.
+        """
+        q = self._embed(claim)
+        guard = _guard_tokens(claim)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None or not self._valid.any():
+                self.misses += 1
+                return None
+            sims = np.where(self._valid, self._vectors @ q, -np.inf)
+            for slot in np.argsort(-sims):
+                if sims[slot] < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if now - entry["created_at"] > self.ttl:
+                    self._drop(int(slot))
+                    continue
+                if entry["params"] != params or entry["guard"] != guard:
+                    continue
+                entry["last_access"] = now
+                self.hits += 1
+                result = dict(entry["result"])
+                result["claim"] = claim
+                result["cached_claim"] = entry["claim"]
+                result["cache_similarity"] = float(sims[slot])
+                return result
+            self.misses += 1
+            return None
+
+    def put(self, claim: str, params: tuple, result: Dict) -> None:
+        v = self._embed(claim)
+        now = time.time()
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(v)), dtype=np.float32)
+            if not self._free:
+                # Expired entries go first, then the least recently used one
+                expired = [i for i, e in enumerate(self._entries) if e and now - e["created_at"] > self.ttl]
+                for i in expired:
+                    self._drop(i)
+                if not self._free:
+                    lru = min(range(self.max_entries), key=lambda i: self._entries[i]["last_access"])
+                    self._drop(lru)
+                    self.evictions += 1
+            slot = self._free.pop()
+            self._vectors[slot] = v
+            self._valid[slot] = True
+            self._entries[slot] = {
+                "claim": claim,
+                "params": params,
+                "guard": _guard_tokens(claim),
+                "result": result,
+                "created_at": now,
+                "last_access": now,
+            }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._valid.sum()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "threshold": self.threshold,
+                "ttl": self.ttl,
+                "max_entries": self.max_entries,
+            }
+
+if __name__ == "__main__":
+    from similarity import SimilarityFilter
+    cache = ClaimResultCache(SimilarityFilter())
+    cache.put("Narendra Modi is the Prime Minister of India", (10, 5), {"verdict": "VERIFIED"})
+    for c in ["Modi is PM of India", "Narendra Modi is not the Prime Minister of India", "The Earth orbits the Sun"]:
+        print(f"{c!r}: {cache.get(c, (10, 5))}")
+    print(cache.stats())
@@ -1,75 +1,281 @@
 import requests
 import re
-from bs4 import BeautifulSoup
-from ddgs import DDGS
-from typing import List, Dict
+import codecs
+from html.parser import HTMLParser
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+from typing import Callable, List, Dict, Optional, Tuple
+from cache_store import CacheStore
+from dense_index import DenseIndex
+from sparse_index import SparseIndex
+from metrics import in_context, record, register_cache, span
+import socket
+import threading
 import hashlib
-import json
+import time
+import glob
 import os
 
+# Sentence boundary used for passages: sentence-ending punctuation followed by spaces
+_SENTENCE_END = re.compile(r'(?<=[.!?]) +')
+MAX_PASSAGES_PER_PAGE = 10
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+
+class _TextExtractor(HTMLParser):
+    """
+    Incremental visible-text extractor: text inside script/style/nav is dropped,
+    everything else is concatenated as it streams in.
+    """
+    SKIP_TAGS = frozenset(["script", "style", "nav"])
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+    def take(self) -> str:
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+class FetchAbandoned(Exception):
+    pass
+
+class _Abandon:
+    """
+    Lets _fetch_all give up on a fetch: the fetch stops at its next chunk, and the
+    socket of an open response is shut down so a read blocked on a silent server
+    returns at once. (Closing the response instead would wait on that very read.)
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+
+    def is_set(self) -> bool:
+        return self._event.is_set()
+
+    def set(self) -> None:
+        with self._lock:
+            self._event.set()
+            response = self._response
+        if response is not None:
+            self._shutdown(response)
+
+    def attach(self, response) -> None:
+        with self._lock:
+            self._response = response
+            abandoned = self._event.is_set()
+        if abandoned:
+            self._shutdown(response)
+
+    @staticmethod
+    def _shutdown(response) -> None:
+        try:
+            sock = response.raw._fp.fp.raw._sock
+            sock.shutdown(socket.SHUT_RDWR)
+        except Exception:
+            pass
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise FetchAbandoned()
+
 class Retriever:
-    def __init__(self, k: int = 10, mode: str = "web", cache_dir: str = "cache"):
+    def __init__(self, k: int = 10, mode: str = "web", cache_dir: str = "cache",
+                 max_workers: int = 8, per_host_limit: int = 2,
+                 fetch_timeout: float = 10, time_budget: float = 15, claim_time_cap: float = None,
+                 cache_ttl: Dict[str, float] = None, cache_max_entries: int = 100000,
+                 page_ttl: float = 6 * 3600, page_cache_max_entries: int = 200000,
+                 dense_index_dir: str = "dense-index/", sparse_index_dir: str = "sparse-index/",
+                 hybrid_alpha: float = 0.5, hybrid_pool: int = 5,
+                 max_page_bytes: int = 2 * 1024 * 1024, read_chunk_bytes: int = 16384):
         self.k = k
         self.mode = mode
         self.cache_dir = cache_dir
-        # No pre-initialization needed as we use context manager in _retrieve_web
+        # Concurrent page fetching: bounded pool, per-host limits, wall-clock budget per claim
+        self.fetch_timeout = fetch_timeout
+        self.time_budget = time_budget
+        # Hard cap on a claim's fetching, queueing included (default 2 x time_budget)
+        self.claim_time_cap = claim_time_cap if claim_time_cap is not None else 2 * time_budget
+        self.per_host_limit = per_host_limit
+        # Page bodies are streamed and parsed incrementally, up to max_page_bytes
+        self.max_page_bytes = max_page_bytes
+        self.read_chunk_bytes = read_chunk_bytes
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ares-fetch")
+        # Pooled keep-alive session shared by all fetch workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            "User-Agent": "ARES-POC Research Bot (academic project)"
+        })
         if not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
+        # Indexed single-file cache; legacy per-claim JSON files are imported once
+        db_path = os.path.join(cache_dir, "retrieval.sqlite3")
+        fresh_db = not os.path.exists(db_path)
+        self.cache = CacheStore(db_path, ttl=cache_ttl, max_entries=cache_max_entries)
+        if fresh_db and glob.glob(os.path.join(cache_dir, "*.json")):
+            print(f"[INFO] Migrated {self.cache.migrate_from_dir(cache_dir)} legacy cache entries")
+        # URL-level passage cache shared across claims; stale pages are revalidated
+        # with conditional GETs (ETag / Last-Modified) instead of full downloads
+        self.page_ttl = page_ttl
+        self.page_cache = CacheStore(os.path.join(cache_dir, "pages.sqlite3"),
+                                     ttl={"page": page_ttl}, max_entries=page_cache_max_entries)
+        register_cache("retrieval", self.cache.stats)
+        register_cache("pages", self.page_cache.stats)
+        # Offline corpus search for wiki mode when a prebuilt dense index is present
+        self.dense_index = None
+        if mode in ("wiki", "hybrid") and DenseIndex.exists(dense_index_dir):
+            self.dense_index = DenseIndex(dense_index_dir)
+        # BM25 over the local corpus for mode="bm25", fused with embeddings for mode="hybrid"
+        self.sparse_index = None
+        if mode in ("bm25", "hybrid"):
+            if SparseIndex.exists(sparse_index_dir):
+                self.sparse_index = SparseIndex(sparse_index_dir)
+            else:
+                print(f"[ERROR] Sparse index {sparse_index_dir} not found. Build it with sparse_index.py")
+        self.hybrid_alpha = hybrid_alpha
+        self.hybrid_pool = hybrid_pool
+        self._similarity = None
 
-    def retrieve(self, claim: str, local_data: List[Dict] = None) -> List[Dict[str, str]]:
+    def retrieve(self, claim: str, local_data: List[Dict] = None, k: int = None) -> List[Dict[str, str]]:
         """
         R(C) operator with multi-backend support and caching for determinism.
+        `k` overrides the retrieval depth for this call only.
         """
-        cache_key = hashlib.md5(f"{self.mode}_{claim}".encode()).hexdigest()
-        cache_path = os.path.join(self.cache_dir, f"{cache_key}.json")
-        
-        if os.path.exists(cache_path):
-            with open(cache_path, 'r') as f:
-                return json.load(f)
+        k = k or self.k
+        cache_key = self._cache_key(claim, k)
+        cached = self.cache.get(cache_key, self.mode)
+        if cached is not None:
+            return cached
 
+        complete = True
         if self.mode == "wiki":
-            # R_wiki(C) - Simulated or Local Wiki search
-            results = self._retrieve_local(claim, local_data)
+            # R_wiki(C) - Caller-provided passages, else dense search over the local corpus
+            if not local_data and self.dense_index is not None:
+                with span("search"):
+                    results = self.dense_index.search(claim, k=k)
+            else:
+                results = self._retrieve_local(claim, local_data)
         elif self.mode == "liar":
             # R_liar(C) - Local data retrieval
             results = self._retrieve_local(claim, local_data)
+        elif self.mode == "bm25":
+            # R_bm25(C) - Lexical search over the local corpus
+            with span("search"):
+                results = self.sparse_index.search(claim, k=k) if self.sparse_index else []
+        elif self.mode == "hybrid":
+            # R_hybrid(C) - BM25 + dense candidates fused with embedding scores
+            with span("search"):
+                results = self._retrieve_hybrid(claim, k)
         else:
             # R_web(C) - Web search
-            results = self._retrieve_web(claim)
+            results, complete = self._retrieve_web(claim, k)
 
         # Ensure deterministic order by text
         results.sort(key=lambda x: x['text'])
         
-        # Save to cache
-        with open(cache_path, 'w') as f:
-            json.dump(results, f)
+        # Save to cache; results missing pages lost to the time budget (or a failed
+        # search) are not, so a later call can retrieve them in full
+        if complete:
+            self.cache.put(cache_key, self.mode, results)
             
         return results
 
-    def _retrieve_web(self, claim: str) -> List[Dict[str, str]]:
+    def _cache_key(self, claim: str, k: int) -> str:
+        # k only changes web and dense results; pass-through local modes keep their original key
+        if self.mode == "liar" or (self.mode == "wiki" and self.dense_index is None):
+            return hashlib.md5(f"{self.mode}_{claim}".encode()).hexdigest()
+        return hashlib.md5(f"{self.mode}_k{k}_{claim}".encode()).hexdigest()
+
+    def _retrieve_web(self, claim: str, k: int) -> Tuple[List[Dict[str, str]], bool]:
+        """
+        Passages of the top-k search hits, and whether every page was fetched
+        within the time budget.
+        """
         results = []
+        complete = False
         try:
-            # Research Integrity: Use neutral query without source bias
-            # Let W(E) handle the credibility weighting in the truth functional
-            with DDGS() as ddgs:
-                search_results = list(ddgs.text(claim, max_results=self.k))
+            with span("search"):
+                search_results = self._search(claim, k)
+            
+            # Pages are fetched concurrently; results are consumed in search-rank order
+            page_passages = self._fetch_all([result['href'] for result in search_results])
+            complete = all(passages is not None for passages in page_passages)
             
-            for result in search_results:
+            for rank, (result, passages) in enumerate(zip(search_results, page_passages)):
                 url = result['href']
                 try:
-                    content = self._scrape_url(url)
-                    passages = self._split_into_passages(content)
-                    for p in passages:
+                    for p in passages or []:
                         results.append({
                             'url': url,
                             'text': p,
-                            'source': result.get('title', 'Unknown')
+                            'source': result.get('title', 'Unknown'),
+                            'rank': rank
                         })
                 except Exception:
                     pass
         except Exception as e:
             print(f"[ERROR] Retrieval failed: {e}")
-        return results
+        return results, complete
+
+    def _search(self, claim: str, k: int) -> List[Dict[str, str]]:
+        """
+        Web search hits as [{"href", "title"}], best first.
+        """
+        # Imported on first web search so offline modes do not need the package
+        from ddgs import DDGS
+        # Research Integrity: Use neutral query without source bias
+        # Let W(E) handle the credibility weighting in the truth functional
+        with DDGS() as ddgs:
+            return list(ddgs.text(claim, max_results=k))
+
+    def _retrieve_hybrid(self, claim: str, k: int) -> List[Dict[str, str]]:
+        """
+        Candidate generation: top (k * hybrid_pool) passages from BM25 and, if
+        built, the dense index. Candidates are fused as
+        alpha * BM25/max(BM25) + (1 - alpha) * cos(C, E) and the top k returned.
+        """
+        if self.sparse_index is None:
+            return []
+        pool = k * self.hybrid_pool
+        candidates = {}
+        for p in self.sparse_index.search(claim, k=pool):
+            candidates[(p['url'], p['text'])] = p
+        if self.dense_index is not None:
+            for p in self.dense_index.search(claim, k=pool):
+                candidates.setdefault((p['url'], p['text']), p)
+        if not candidates:
+            return []
+
+        if self._similarity is None:
+            from similarity import SimilarityFilter
+            self._similarity = SimilarityFilter()
+        scored = self._similarity.rank(claim, list(candidates.values()), m=len(candidates))
+        max_bm25 = max(p.get('bm25_score', 0.0) for p in scored) or 1.0
+        for p in scored:
+            p['hybrid_score'] = (self.hybrid_alpha * p.get('bm25_score', 0.0) / max_bm25 +
+                                 (1 - self.hybrid_alpha) * p.pop('similarity_score'))
+        scored.sort(key=lambda x: (-x['hybrid_score'], x['text']))
+        return scored[:k]
 
     def _retrieve_local(self, claim: str, data: List[Dict]) -> List[Dict[str, str]]:
         # In research datasets like FEVER, data is often pre-associated or requires a separate index.
@@ -78,26 +284,168 @@ class Retriever:
             return data
         return []
 
-    def _scrape_url(self, url: str) -> str:
-        # Existing scraping logic remains similar but more robust
+    def _fetch_all(self, urls: List[str]) -> List[Optional[List[str]]]:
+        """
+        Fetches all URLs concurrently. Each fetch gets self.time_budget seconds
+        from when it starts running, so time queued behind other claims' fetches
+        (the pool and host slots are shared) is not charged to it; the claim as a
+        whole stops after self.claim_time_cap seconds.
+        Abandoned fetches are stopped, freeing their pool thread.
+        Returns passage lists aligned with `urls`; failed fetches yield [] and
+        abandoned ones yield None.
+        """
+        if not urls:
+            return []
+        started = [None] * len(urls)
+        abandons = [_Abandon() for _ in urls]
+
+        def fetch(i: int, url: str) -> List[str]:
+            return self._fetch_limited(url, abandons[i], on_start=lambda: started.__setitem__(i, time.monotonic()))
+
+        # Each fetch runs in the caller's context so its spans join the request timings
+        futures = [self._executor.submit(in_context(fetch), i, url) for i, url in enumerate(urls)]
+        cap = time.monotonic() + self.claim_time_cap
+        while True:
+            now = time.monotonic()
+            pending = [i for i, f in enumerate(futures)
+                       if not f.done() and (started[i] is None or now - started[i] < self.time_budget)]
+            if not pending or now >= cap:
+                break
+            # Queued fetches have no deadline yet; look at them again shortly
+            timeout = min(self.time_budget - (now - started[i]) if started[i] is not None else 0.05
+                          for i in pending)
+            wait([futures[i] for i in pending], timeout=min(timeout, cap - now), return_when=FIRST_COMPLETED)
+        
+        contents = []
+        for url, future, abandon in zip(urls, futures, abandons):
+            if not future.done():
+                future.cancel()
+                abandon.set()
+                print(f"[ERROR] Fetch exceeded time budget: {url}")
+                contents.append(None)
+            elif future.cancelled() or future.exception() is not None:
+                contents.append([])
+            else:
+                contents.append(future.result())
+        return contents
+
+    def _fetch_limited(self, url: str, abandon: _Abandon = None,
+                       on_start: Callable[[], None] = None) -> List[str]:
+        host = urlparse(url).netloc.lower()
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            slot = self._host_slots[host]
+        # Give up the wait for a host slot too once the claim has moved on
+        while not slot.acquire(timeout=0.05):
+            if abandon is not None and abandon.is_set():
+                return []
+        try:
+            with span("fetch"):
+                if on_start is not None:
+                    on_start()
+                return self._fetch_passages(url, abandon)
+        finally:
+            slot.release()
+
+    def _fetch_passages(self, url: str, abandon: _Abandon = None) -> List[str]:
+        """
+        Passages of one page, served from the URL cache while fresh and
+        revalidated with a conditional GET once stale. An abandoned fetch
+        returns [] and caches nothing.
+        """
+        key = hashlib.md5(url.encode()).hexdigest()
+        entry = self.page_cache.get_entry(key)
+        headers = {}
+        if entry is not None:
+            page, created_at = entry
+            if time.time() - created_at <= self.page_ttl:
+                return page['passages']
+            if page.get('etag'):
+                headers['If-None-Match'] = page['etag']
+            if page.get('last_modified'):
+                headers['If-Modified-Since'] = page['last_modified']
+
+        try:
+            if abandon is not None:
+                abandon.check()
+            with self.session.get(url, headers=headers, timeout=self.fetch_timeout, stream=True) as response:
+                if abandon is not None:
+                    abandon.attach(response)
+                if response.status_code == 304 and entry is not None:
+                    self.page_cache.touch(key)
+                    return page['passages']
+
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                if content_type and content_type not in HTML_CONTENT_TYPES:
+                    # PDFs, images, feeds...: nothing to extract, body is never read
+                    passages = []
+                else:
+                    passages = self._stream_passages(response, abandon)
+        except Exception:
+            return []
+
+        if response.ok:
+            self.page_cache.put(key, "page", {
+                'url': url,
+                'passages': passages,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            })
+        return passages
+
+    def _stream_passages(self, response, abandon: _Abandon = None) -> List[str]:
+        """
+        Reads the body in chunks (at most self.max_page_bytes), feeds them to the
+        incremental extractor and stops as soon as MAX_PASSAGES_PER_PAGE complete
+        passages exist. Same passages as _split_into_passages(_extract_text(body)).
+        Raises FetchAbandoned at the first chunk after `abandon` is set.
+        """
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        parser = _TextExtractor()
+        passages = []
+        tail = ""
+        read = 0
+        # Parse/split time only; network reads are part of the enclosing "fetch" span
+        extract_seconds = 0.0
+        for chunk in response.iter_content(chunk_size=self.read_chunk_bytes):
+            if abandon is not None:
+                abandon.check()
+            start = time.perf_counter()
+            chunk = chunk[:self.max_page_bytes - read]
+            read += len(chunk)
+            parser.feed(decoder.decode(chunk))
+            # Every piece but the last is a finished sentence; the last may still grow
+            pieces = _SENTENCE_END.split(tail + parser.take().replace('\n', ' '))
+            tail = pieces.pop()
+            passages.extend(p.strip() for p in pieces if len(p.strip()) > 40)
+            extract_seconds += time.perf_counter() - start
+            if len(passages) >= MAX_PASSAGES_PER_PAGE or read >= self.max_page_bytes:
+                break
+        else:
+            parser.feed(decoder.decode(b"", final=True))
+        start = time.perf_counter()
+        parser.close()
+        passages.extend(self._split_into_passages(tail + parser.take()))
+        record("extract", extract_seconds + time.perf_counter() - start)
+        return passages[:MAX_PASSAGES_PER_PAGE]
+
+    def _extract_text(self, html: str) -> str:
+        # Visible text of a complete document (script/style/nav removed)
         try:
-            headers = {
-                "User-Agent": "ARES-POC Research Bot (academic project)"
-            }
-            response = requests.get(url, headers=headers, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            for script in soup(["script", "style"]):
-                script.decompose()
-            return soup.get_text()
-        except:
+            parser = _TextExtractor()
+            parser.feed(html)
+            parser.close()
+            return parser.take()
+        except Exception:
             return ""
 
     def _split_into_passages(self, text: str) -> List[str]:
         # Sentence-level splitting for better entailment sensitivity
         # Regex splits by sentence endings followed by spaces
-        sentences = re.split(r'(?<=[.!?]) +', text.replace('\n', ' '))
+        sentences = _SENTENCE_END.split(text.replace('\n', ' '))
         # Filter for meaningful length and return top sentences
-        return [s.strip() for s in sentences if len(s.strip()) > 40][:10]
+        return [s.strip() for s in sentences if len(s.strip()) > 40][:MAX_PASSAGES_PER_PAGE]
 
 if __name__ == "__main__":
     retriever = Retriever(k=3)
@@ -0,0 +1,134 @@
+# Pre-forked multi-worker API server.
+# The parent loads S(C,E) and N(C,E) once (via app.py), freezes them, then forks
+# N uvicorn workers on one shared listening socket. Model weights are shared
+# copy-on-write: workers only read them, so they are never copied per worker.
+# Intra-op threads are split between workers so they do not oversubscribe cores.
+# Needs os.fork() (Linux/macOS); on Windows run app.py instead.
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def run_worker(sock: socket.socket, threads: int) -> None:
+    import torch
+    import uvicorn
+    import app
+
+    torch.set_num_threads(threads)
+    config = uvicorn.Config(app.app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+def spawn(sock: socket.socket, threads: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            # The parent's handlers only forward signals to the workers
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            run_worker(sock, threads)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"[ERROR] Worker {os.getpid()} failed: {e}")
+            code = 1
+        finally:
+            sys.stdout.flush()
+            # Skip the parent's atexit handlers and buffered state
+            os._exit(code)
+    return pid
+
+def serve(host: str, port: int, workers: int, threads: int) -> None:
+    # -------------------------------
+    # 1. Thread budget (before torch is imported, so its OpenMP/MKL pools see it)
+    # -------------------------------
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+    # -------------------------------
+    # 2. Load models once in the parent
+    # -------------------------------
+    from model_registry import registry
+    import app  # builds the Verifier and preloads its models
+    print(f"[INFO] Froze {registry.freeze()} model(s) for sharing: {registry.loaded()}")
+    # Keep the garbage collector from touching (and so copying) the pages of
+    # everything loaded so far
+    gc.collect()
+    gc.freeze()
+
+    # -------------------------------
+    # 3. One listening socket, accepted on by every worker
+    # -------------------------------
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # -------------------------------
+    # 4. Fork and supervise
+    # -------------------------------
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        pid = spawn(sock, threads)
+        children[pid] = time.monotonic()
+    print(f"[INFO] Serving on http://{host}:{port} with {workers} worker(s) x {threads} thread(s)")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"[ERROR] Worker {pid} exited (status {status}); restarting")
+        # Back off when a worker dies right after starting, instead of fork-looping
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)
+        pid = spawn(sock, threads)
+        children[pid] = time.monotonic()
+    sock.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ARES_POC pre-forked API server")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ARES_SERVE_WORKERS", "0")),
+                        help="Worker processes (default: ARES_SERVE_WORKERS, else one per CPU)")
+    parser.add_argument("--threads-per-worker", type=int, default=0,
+                        help="Intra-op threads per worker (default: CPUs / workers)")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("[ERROR] serve.py needs os.fork(); run app.py on this platform.")
+        sys.exit(1)
+    cpus = available_cpus()
+    workers = args.workers if args.workers > 0 else cpus
+    threads = args.threads_per_worker if args.threads_per_worker > 0 else max(1, cpus // workers)
+    serve(args.host, args.port, workers, threads)
@@ -1,34 +1,112 @@
-from sentence_transformers import SentenceTransformer, util
-import torch
+import numpy as np
+import os
 from typing import List, Dict
+from embedding_cache import EmbeddingCache
+from batching import get_scheduler
+from inference_backends import resolve_backend
+from model_registry import registry
+from metrics import register_cache, span
 
-_MODEL_CACHE = {}
+_EMBEDDING_CACHES = {}
 
 class SimilarityFilter:
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', threshold: float = 0.6):
-        if model_name not in _MODEL_CACHE:
-            _MODEL_CACHE[model_name] = SentenceTransformer(model_name)
-        self.model = _MODEL_CACHE[model_name]
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', threshold: float = 0.6,
+                 cache_dir: str = "cache", use_cache: bool = True,
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0, backend: str = None):
+        # The model itself comes from the process-wide registry on first encode
+        # backend: fp32 | int8 | onnx (default from ARES_EMBED_BACKEND, else fp32)
+        self.model_name = model_name
+        self.backend = resolve_backend(backend, "ARES_EMBED_BACKEND")
+        self.model_spec = ("sentence-transformer", model_name, self.backend)
         self.threshold = threshold
+        # Encode work from concurrent verify() calls is micro-batched per model
+        spec = self.model_spec
+        self.scheduler = get_scheduler(
+            f"encode:{model_name}@{self.backend}",
+            lambda texts: registry.get(*spec).encode(texts, convert_to_numpy=True),
+            max_batch_size=max_batch_size, max_wait_ms=max_wait_ms
+        )
+        # Embedding stores are shared per (model, directory) like the models themselves;
+        # non-fp32 backends get their own store so vectors are never mixed
+        self.embedding_cache = None
+        if use_cache:
+            store_dir = os.path.join(cache_dir, "embeddings")
+            cache_model = model_name if self.backend == "fp32" else f"{model_name}@{self.backend}"
+            if (cache_model, store_dir) not in _EMBEDDING_CACHES:
+                _EMBEDDING_CACHES[(cache_model, store_dir)] = EmbeddingCache(cache_model, cache_dir=store_dir)
+            self.embedding_cache = _EMBEDDING_CACHES[(cache_model, store_dir)]
+            register_cache(f"embeddings:{cache_model}", self.embedding_cache.stats)
+
+    @property
+    def model(self):
+        return registry.get(*self.model_spec)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embeds texts, sending only embedding-cache misses to model.encode.
+        """
+        if self.embedding_cache is None:
+            with span("encode"):
+                return np.stack(self.scheduler.submit(texts)).astype(np.float32)
+
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            # Deduplicate misses so repeated passages are encoded once
+            miss_texts = list(dict.fromkeys(texts[i] for i in missing))
+            with span("encode"):
+                encoded = np.stack(self.scheduler.submit(miss_texts))
+            self.embedding_cache.put_many(miss_texts, encoded)
+            # Serve misses at the stored float16 precision so later hits are identical
+            rounded = np.asarray(encoded, dtype=np.float16).astype(np.float32)
+            fresh = dict(zip(miss_texts, rounded))
+            for i in missing:
+                vectors[i] = fresh[texts[i]]
+        return np.stack(vectors)
 
     def rank(self, claim: str, passages: List[Dict[str, str]], m: int = 5) -> List[Dict[str, str]]:
         """
         Top-M selection operator: E* = TopM(S(C, E_i))
         Ranks all passages by similarity and selects top M.
         """
-        if not passages:
-            return []
-            
-        claim_embedding = self.model.encode(claim, convert_to_tensor=True)
-        passage_texts = [p['text'] for p in passages]
-        passage_embeddings = self.model.encode(passage_texts, convert_to_tensor=True)
-        
-        cosine_scores = util.cos_sim(claim_embedding, passage_embeddings)[0]
+        return self.rank_many([claim], [passages], m=m)[0]
+
+    def rank_many(self, claims: List[str], passage_lists: List[List[Dict[str, str]]], m: int = 5) -> List[List[Dict[str, str]]]:
+        """
+        TopM(S(C_j, E_i)) for several claims, embedding the union of all
+        claims and passages in a single encode pass.
+        """
+        texts = list(dict.fromkeys(
+            [c for c, ps in zip(claims, passage_lists) if ps] +
+            [p['text'] for ps in passage_lists for p in ps]
+        ))
+        if not texts:
+            return [[] for _ in claims]
+        row = {t: i for i, t in enumerate(texts)}
+        embeddings = self.encode(texts)
         
+        ranked = []
+        for claim, passages in zip(claims, passage_lists):
+            if not passages:
+                ranked.append([])
+                continue
+            claim_embedding = embeddings[row[claim]]
+            passage_embeddings = embeddings[[row[p['text']] for p in passages]]
+            ranked.append(self._top_m(passages, self._cos_sim(claim_embedding, passage_embeddings), m))
+        return ranked
+
+    @staticmethod
+    def _cos_sim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        # cos(a, b_i) for one vector against the rows of a matrix
+        a = a / max(np.linalg.norm(a), 1e-12)
+        b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+        return b @ a
+
+    def _top_m(self, passages: List[Dict[str, str]], cosine_scores: np.ndarray, m: int) -> List[Dict[str, str]]:
         scored_passages = []
         for i, score in enumerate(cosine_scores):
             p = passages[i].copy()
-            p['similarity_score'] = score.item()
+            p['similarity_score'] = float(score)
             scored_passages.append(p)
                 
         # Sort by similarity score descending
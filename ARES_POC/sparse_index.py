@@ -0,0 +1,263 @@
+# Offline lexical retrieval backend for R(C): a persistent BM25 inverted index.
+#   terms.sqlite3   - term -> (postings offset, document frequency)
+#   post_docs.u32   - concatenated postings (passage ids), memory-mapped
+#   post_tfs.u16    - term frequencies aligned with post_docs.u32
+#   doc_len.u32     - token count per passage
+#   passages.jsonl  - {"text", "url"} per passage id (see passage_store.py)
+#   meta.json       - written last; marks a complete build
+# Rare entity names (schemes, ministries, people) carry high IDF, which is where
+# embedding-only retrieval is weakest.
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from passage_store import LazyMaps, PassageWriter, PassageStore, ReadOnlyDB, map_array
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the to was were will with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class SparseIndex:
+    # Postings lists shorter than this are scanned even when they could be pruned
+    PRUNE_MIN_DF = 1024
+
+    def __init__(self, index_dir: str = "sparse-index/", k1: float = 1.2, b: float = 0.75):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        with open(os.path.join(index_dir, "meta.json"), 'r') as f:
+            self.meta = json.load(f)
+        self.passages = PassageStore(index_dir)
+        self._db = ReadOnlyDB(os.path.join(index_dir, "terms.sqlite3"))
+        self._maps = LazyMaps(lambda: {
+            "docs": map_array(os.path.join(index_dir, "post_docs.u32"), '<u4'),
+            "tfs": map_array(os.path.join(index_dir, "post_tfs.u16"), '<u2'),
+            "doc_len": map_array(os.path.join(index_dir, "doc_len.u32"), '<u4'),
+        })
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, "meta.json"))
+
+    @staticmethod
+    def build(passages: Iterable[Dict[str, str]], index_dir: str = "sparse-index/",
+              block_postings: int = 10000000) -> "SparseIndex":
+        """
+        One-time build step, SPIMI-style: postings are collected in compact
+        blocks of at most `block_postings` entries and spilled to disk as numpy
+        arrays; the blocks are then merged in term order, a range of terms at a
+        time, so each term's postings are contiguous on disk. Memory is bounded
+        by the block size and the vocabulary, not the corpus.
+        """
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        meta_path = os.path.join(index_dir, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        vocab = {}                       # term -> term id, in first-seen order
+        df = array('I')                  # term id -> document frequency
+        doc_len = array('I')
+        block_dir = tempfile.mkdtemp(prefix="blocks-", dir=index_dir)
+        blocks = []
+        buf = (array('I'), array('I'), array('H'))   # term ids, passage ids, tfs
+
+        def spill():
+            path = os.path.join(block_dir, f"block{len(blocks)}")
+            for name, values, dtype in zip(("terms", "docs", "tfs"), buf, ('<u4', '<u4', '<u2')):
+                np.save(f"{path}.{name}.npy", np.asarray(values, dtype=dtype))
+                del values[:]
+            blocks.append(path)
+
+        try:
+            with PassageWriter(index_dir) as writer:
+                for p in passages:
+                    pid = writer.add(p)
+                    tokens = tokenize(p['text'])
+                    doc_len.append(len(tokens))
+                    for term, tf in Counter(tokens).items():
+                        tid = vocab.get(term)
+                        if tid is None:
+                            tid = vocab[term] = len(df)
+                            df.append(0)
+                        df[tid] += 1
+                        buf[0].append(tid)
+                        buf[1].append(pid)
+                        buf[2].append(min(tf, 65535))
+                    if len(buf[0]) >= block_postings:
+                        spill()
+            if buf[0]:
+                spill()
+            n = len(doc_len)
+            if n == 0:
+                raise ValueError("SparseIndex.build: corpus is empty")
+
+            # Output order is sorted terms; each block is re-sorted by that rank once.
+            # Stable sorts keep passage ids ascending within a term (blocks hold
+            # increasing id ranges).
+            terms = sorted(vocab)
+            rank = np.empty(len(terms), dtype=np.uint32)
+            rank[[vocab[t] for t in terms]] = np.arange(len(terms), dtype=np.uint32)
+            del vocab
+            for path in blocks:
+                r = rank[np.load(f"{path}.terms.npy")]
+                order = np.argsort(r, kind='stable')
+                np.save(f"{path}.terms.npy", r[order])
+                for name in ("docs", "tfs"):
+                    np.save(f"{path}.{name}.npy", np.load(f"{path}.{name}.npy")[order])
+            df_sorted = np.asarray(df, dtype=np.int64)[np.argsort(rank)]
+            offsets = np.concatenate([[0], np.cumsum(df_sorted)])
+
+            db_path = os.path.join(index_dir, "terms.sqlite3")
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            conn = sqlite3.connect(db_path)
+            conn.execute("CREATE TABLE terms (term TEXT PRIMARY KEY, offset INTEGER, df INTEGER) WITHOUT ROWID")
+            conn.executemany("INSERT INTO terms VALUES (?, ?, ?)",
+                             ((t, int(offsets[r]), int(df_sorted[r])) for r, t in enumerate(terms)))
+            conn.commit()
+            conn.close()
+
+            # Merge: a range of terms holding about block_postings postings at a time
+            mapped = [tuple(np.load(f"{path}.{name}.npy", mmap_mode='r') for name in ("terms", "docs", "tfs"))
+                      for path in blocks]
+            with open(os.path.join(index_dir, "post_docs.u32"), 'wb') as df_, \
+                 open(os.path.join(index_dir, "post_tfs.u16"), 'wb') as tf_:
+                r0 = 0
+                while r0 < len(terms):
+                    r1 = max(r0 + 1, int(np.searchsorted(offsets, offsets[r0] + block_postings, side='right')) - 1)
+                    r1 = min(r1, len(terms))
+                    parts = []
+                    for b_terms, b_docs, b_tfs in mapped:
+                        lo, hi = np.searchsorted(b_terms, [r0, r1])
+                        parts.append((b_terms[lo:hi], b_docs[lo:hi], b_tfs[lo:hi]))
+                    order = np.argsort(np.concatenate([t for t, _, _ in parts]), kind='stable')
+                    df_.write(np.concatenate([d for _, d, _ in parts])[order].astype('<u4').tobytes())
+                    tf_.write(np.concatenate([f for _, _, f in parts])[order].astype('<u2').tobytes())
+                    r0 = r1
+            del mapped
+            np.asarray(doc_len, dtype='<u4').tofile(os.path.join(index_dir, "doc_len.u32"))
+        finally:
+            shutil.rmtree(block_dir, ignore_errors=True)
+
+        with open(meta_path, 'w') as f:
+            json.dump({"count": n, "avgdl": float(sum(doc_len)) / n, "terms": len(terms)}, f)
+        return SparseIndex(index_dir)
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def score(self, claim: str, k: int = 10) -> List[tuple]:
+        """
+        BM25 top-k as [(passage_id, score)], best first; equal scores go to the
+        lower passage id.
+        MaxScore pruning: terms are scored in decreasing order of their bound
+        idf * (k1 + 1). Once the k-th best score exceeds what the remaining terms
+        could add together, no unseen passage can enter the top-k, so those
+        (frequent, low-idf) terms only update passages already found, by binary
+        search in their postings instead of a full scan.
+        """
+        terms = sorted(set(tokenize(claim)))
+        if not terms:
+            return []
+        maps = self._maps.get()
+        n = self.meta["count"]
+        placeholders = ",".join("?" * len(terms))
+        rows = self._db.conn().execute(
+            f"SELECT offset, df FROM terms WHERE term IN ({placeholders})", terms
+        ).fetchall()
+        if not rows:
+            return []
+
+        idfs = [(math.log(1 + (n - df + 0.5) / (df + 0.5)), offset, df) for offset, df in rows]
+        idfs.sort(key=lambda t: (-t[0], t[1]))
+        # rest[j]: the most terms j.. can add to one passage's score
+        rest = np.cumsum([idf * (self.k1 + 1) for idf, _, _ in idfs][::-1])[::-1]
+
+        candidates = np.empty(0, dtype=np.int64)   # ascending passage ids
+        scores = np.empty(0, dtype=np.float64)
+        docs, contributions = [], []               # scanned since the last merge
+        pruned = False
+        for j, (idf, offset, df) in enumerate(idfs):
+            postings = maps["docs"][offset:offset + df]
+            tfs = maps["tfs"][offset:offset + df]
+            if not pruned and df >= self.PRUNE_MIN_DF:
+                candidates, scores = self._merge(candidates, scores, docs, contributions)
+                docs, contributions = [], []
+                if len(scores) >= k > 0:
+                    kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+                    pruned = kth > rest[j]
+            if pruned:
+                # Only passages already found can still reach the top-k
+                pos = np.minimum(np.searchsorted(postings, candidates.astype('<u4')), df - 1)
+                hit = postings[pos] == candidates
+                scores[hit] += self._contributions(idf, candidates[hit], tfs[pos[hit]], maps)
+            else:
+                d = np.asarray(postings, dtype=np.int64)
+                docs.append(d)
+                contributions.append(self._contributions(idf, d, tfs, maps))
+        candidates, scores = self._merge(candidates, scores, docs, contributions)
+
+        if len(scores) > k:
+            # Keep every passage tied at the cut, then order by (-score, id)
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            sel = np.flatnonzero(scores >= kth)
+        else:
+            sel = np.arange(len(scores))
+        top = sel[np.lexsort((candidates[sel], -scores[sel]))][:k]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    @staticmethod
+    def _merge(candidates, scores, docs, contributions):
+        # Per-passage sums of the accumulated scores and the newly scanned postings
+        if not docs:
+            return candidates, scores
+        merged, inverse = np.unique(np.concatenate([candidates] + docs), return_inverse=True)
+        return merged, np.bincount(inverse, weights=np.concatenate([scores] + contributions))
+
+    def _contributions(self, idf: float, docs: np.ndarray, tfs: np.ndarray, maps: Dict) -> np.ndarray:
+        tf = tfs.astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * maps["doc_len"][docs].astype(np.float32) / self.meta["avgdl"])
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, claim: str, k: int = 10) -> List[Dict[str, str]]:
+        results = []
+        for pid, score in self.score(claim, k):
+            p = self.passages[pid]
+            p['bm25_score'] = score
+            results.append(p)
+        return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local BM25 index")
+    parser.add_argument("--wiki-index", type=str, default="wiki-index/")
+    parser.add_argument("--index-dir", type=str, default="sparse-index/")
+    parser.add_argument("--query", type=str, default=None)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if not SparseIndex.exists(args.index_dir):
+        from wiki_index import WikiIndex
+        from dense_index import iter_wiki_passages
+        SparseIndex.build(iter_wiki_passages(WikiIndex(args.wiki_index)), args.index_dir)
+    index = SparseIndex(args.index_dir)
+    print(f"Sparse index: {len(index)} passages, {index.meta['terms']} terms")
+
+    if args.query:
+        for p in index.search(args.query, k=args.k):
+            print(f"{p['bm25_score']:.3f} | {p['url']} | {p['text'][:100]}")
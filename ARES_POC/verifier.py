@@ -3,42 +3,332 @@
 # as defined in the ARES_POC research specification.
 
 import math
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
 from retriever import Retriever
 from similarity import SimilarityFilter
 from entailment import EntailmentOperator
 from credibility import CredibilityWeight
+from dedup import NearDuplicateFilter
+from model_registry import registry
+from metrics import Timings, collect_timings, span
+
+def truth_functional(scored: List[Tuple[float, int, float]]) -> Tuple[float, float]:
+    """
+    Truth'(C) = Σ S·N·W / Σ S and Conf(C) = |Truth'| * log(1 + M)
+    over (S, N, W) triples in Top-M order.
+    """
+    numerator = 0.0
+    denominator = 0.0
+    for s_i, n_i, w_i in scored:
+        numerator += (s_i * n_i * w_i)
+        denominator += s_i
+    truth_prime = numerator / denominator if denominator > 0 else 0.0
+    return truth_prime, abs(truth_prime) * math.log(1 + len(scored))
+
+def verdict_for(truth_prime: float, theta: float = 0.4) -> str:
+    if truth_prime > theta:
+        return "VERIFIED"
+    elif truth_prime < -theta:
+        return "MISINFORMATION"
+    return "UNCERTAIN"
 
 class Verifier:
-    def __init__(self, k: int = 10, m: int = 5, mode: str = "web"):
+    def __init__(self, k: int = 10, m: int = 5, mode: str = "web", theta: float = 0.4,
+                 backend: str = None, early_exit: bool = False,
+                 cascade_model: str = None, cascade_margin: float = None,
+                 dedup_threshold: float = 0.8):
+        # Defaults only; per-call k/m are passed to verify() and never written back
+        self.k = k
         self.m = m
+        # Verdict threshold: |Truth'| must exceed theta for a decisive verdict
+        self.theta = theta
+        # Opt-in: skip N(C,E) calls that can no longer change the verdict
+        self.early_exit = early_exit
         self.retriever = Retriever(k=k, mode=mode)
-        self.similarity = SimilarityFilter()
-        self.entailment = EntailmentOperator()
+        # Inference backend (fp32 | int8 | onnx) for both S and N; None defers to
+        # ARES_EMBED_BACKEND / ARES_NLI_BACKEND
+        self.similarity = SimilarityFilter(backend=backend)
+        self.entailment = EntailmentOperator(backend=backend, cascade_model=cascade_model,
+                                             cascade_margin=cascade_margin)
         self.credibility = CredibilityWeight()
+        # Near-duplicate passages (estimated Jaccard >= dedup_threshold) collapse to
+        # their most credible copy before ranking; None disables the stage
+        self.dedup = NearDuplicateFilter(self.credibility, threshold=dedup_threshold) \
+            if dedup_threshold is not None else None
+
+    def config(self) -> Dict:
+        """
+        Settings that change S, N, W or the verdict (evaluate.py keys its
+        checkpoints on them).
+        """
+        return {
+            "embedding_model": self.similarity.model_name,
+            "embedding_backend": self.similarity.backend,
+            "nli_model": self.entailment.model_spec[1],
+            "nli_backend": self.entailment.backend,
+            "cascade_model": self.entailment.cascade_spec[1] if self.entailment.cascade_spec else None,
+            "cascade_margin": self.entailment.cascade_margin if self.entailment.cascade_spec else None,
+            "theta": self.theta,
+            "dedup_threshold": self.dedup.threshold if self.dedup is not None else None,
+            "early_exit": self.early_exit,
+        }
+
+    def preload(self) -> None:
+        """
+        Loads the S and N models now instead of on the first claim.
+        """
+        registry.preload([self.similarity.model_spec] + self.entailment.model_specs)
 
-    def verify(self, claim: str, local_data: List[Dict] = None) -> Dict:
+    def verify(self, claim: str, local_data: List[Dict] = None, k: int = None, m: int = None,
+               early_exit: bool = None, on_event: Callable[[str, Dict], None] = None) -> Dict:
         """
         V(C) = f(R(C), TopM S(C,E), N(C,E), W(E))
         Full pipeline: Retrieval -> Ranking -> Entailment -> Aggregation.
+        k, m and early_exit override the instance defaults for this call only.
+        on_event(name, payload) is called as the pipeline advances (see verify_with_evidence).
+        The result carries per-stage wall time under "timings".
         """
-        # -------------------------------
-        # Step 1 — Evidence Retrieval R(C)
-        # -------------------------------
-        raw_passages = self.retriever.retrieve(claim, local_data)
-        return self.verify_with_evidence(claim, raw_passages)
+        with collect_timings() as timings:
+            with span("verify"):
+                # -------------------------------
+                # Step 1 — Evidence Retrieval R(C)
+                # -------------------------------
+                with span("retrieval"):
+                    raw_passages = self.retriever.retrieve(claim, local_data, k=k or self.k)
+                if on_event is not None:
+                    on_event("retrieval", {"count": len(raw_passages),
+                                           "sources": [p.get('url', 'internal') for p in raw_passages]})
+                result = self.verify_with_evidence(claim, raw_passages, m=m, early_exit=early_exit,
+                                                   on_event=on_event)
+            result["timings"] = timings.as_dict()
+        return result
 
-    def verify_with_evidence(self, claim: str, evidence_passages: List[Dict[str, str]]) -> Dict:
+    def verify_with_evidence(self, claim: str, evidence_passages: List[Dict[str, str]], m: int = None,
+                             early_exit: bool = None, on_event: Callable[[str, Dict], None] = None) -> Dict:
         """
         V(C) = f(TopM S(C,E), N(C,E), W(E))
         Isolates the verification functional by using provided evidence.
         Used for gold-standard benchmarks (e.g., FEVER).
+        With on_event, N(C,E) runs passage by passage and progress is reported as
+            "topm"    - Top-M passages with S(C,E)
+            "passage" - N and W of one passage, running Truth' and its reachable range
+            "verdict" - the final result (same dict as returned)
+        An exception raised by on_event aborts the verification.
         """
+        with collect_timings() as timings:
+            result = self._verify_evidence(claim, evidence_passages, m, early_exit, on_event)
+            result["timings"] = timings.as_dict()
+        return result
+
+    def _verify_evidence(self, claim: str, evidence_passages: List[Dict[str, str]], m: int,
+                         early_exit: bool, on_event: Callable[[str, Dict], None]) -> Dict:
+        m = m or self.m
         # -------------------------------
         # Step 2 — Similarity Ranking S(C,E) & Top-M selection
         # -------------------------------
         print(f"[DEBUG] Retrieved {len(evidence_passages)} raw passages from R(C)")
-        top_passages = self.similarity.rank(claim, evidence_passages, m=self.m)
+        evidence_passages = self._dedup(evidence_passages)
+        with span("rank"):
+            top_passages = self.similarity.rank(claim, evidence_passages, m=m)
+        if on_event is not None:
+            on_event("topm", {"candidates": len(evidence_passages), "passages": [
+                {"index": i, "source": p.get('url', 'internal'), "text": p['text'][:100] + "...",
+                 "similarity": p['similarity_score']}
+                for i, p in enumerate(top_passages)
+            ]})
+        
+        stop_early = self.early_exit if early_exit is None else early_exit
+        if stop_early or on_event is not None:
+            entailments = self._entail_sequential(claim, top_passages, stop_early, on_event)
+        else:
+            # N(C, E_i) for all Top-M passages in one batched NLI pass
+            entailments = self.entailment.compute_batch(claim, [p['text'] for p in top_passages])
+        with span("aggregate"):
+            result = self._aggregate(claim, top_passages, entailments)
+        if on_event is not None:
+            on_event("verdict", result)
+        return result
+
+    def _dedup(self, passages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        if self.dedup is None:
+            return passages
+        with span("dedup"):
+            kept = self.dedup.filter(passages)
+        if len(kept) < len(passages):
+            print(f"[DEBUG] Collapsed {len(passages) - len(kept)} near-duplicate passages")
+        return kept
+
+    def _entail_sequential(self, claim: str, top_passages: List[Dict[str, str]], stop_early: bool = True,
+                           on_event: Callable[[str, Dict], None] = None) -> List[Optional[int]]:
+        """
+        N(C, E_i) ∈ {-1, 0, +1}, so passage i moves Σ S·N·W by at most |S_i·W_i|.
+        With stop_early, passages are scored in order of that bound; once
+            Truth'_min = (known - remaining) / Σ S,  Truth'_max = (known + remaining) / Σ S
+        give the same verdict, the rest cannot flip it and are skipped (None).
+        Otherwise every passage is scored in Top-M order.
+        """
+        entailments = [None] * len(top_passages)
+        denominator = sum(p['similarity_score'] for p in top_passages)
+        weights = [self.credibility.calculate(p.get('url', 'http://internal.wiki')) for p in top_passages]
+        bounds = [abs(p['similarity_score'] * w_i) for p, w_i in zip(top_passages, weights)]
+        order = list(range(len(top_passages)))
+        if stop_early:
+            order.sort(key=lambda i: -bounds[i])
+        known = 0.0
+        seen_s = 0.0
+        remaining = sum(bounds)
+        for i in order:
+            if stop_early and denominator > 0 and \
+               verdict_for((known - remaining) / denominator, self.theta) == \
+               verdict_for((known + remaining) / denominator, self.theta):
+                break
+            s_i = top_passages[i]['similarity_score']
+            entailments[i] = self.entailment.compute(claim, top_passages[i]['text'])
+            known += s_i * entailments[i] * weights[i]
+            seen_s += s_i
+            remaining -= bounds[i]
+            if on_event is not None:
+                on_event("passage", {
+                    "index": i,
+                    "source": top_passages[i].get('url', 'internal'),
+                    "entailment": entailments[i],
+                    "weight": weights[i],
+                    "contribution": s_i * entailments[i] * weights[i],
+                    # Truth' over the passages scored so far, and the range still reachable
+                    "truth_running": known / seen_s if seen_s > 0 else 0.0,
+                    "truth_bounds": [(known - remaining) / denominator, (known + remaining) / denominator]
+                                    if denominator > 0 else None
+                })
+        return entailments
+
+    def score_evidence(self, claim: str, evidence_passages: List[Dict[str, str]], m: int,
+                       ks: List[int] = None) -> List[Dict]:
+        """
+        Score-once pass for ablations: S for every passage, N and W for every
+        passage that can enter the Top-M of any k in `ks` (all passages count
+        when ks is None). Returns per-passage scores in similarity order, from
+        which derive_verdict() reproduces any (k, M, theta) configuration with
+        k in `ks`.
+        """
+        # Which copy of a near-duplicate group survives depends on the passages
+        # present, so each k is deduplicated over its own rank prefix, as a
+        # k-deep run would be. '_pos' tags passages through the filter.
+        tagged = [dict(p, _pos=i) for i, p in enumerate(evidence_passages)]
+        prefixes = {k: [p for p in tagged if p.get('rank', 0) < k] for k in ks} if ks else {None: tagged}
+        kept = {k: {p['_pos'] for p in self._dedup(prefix)} for k, prefix in prefixes.items()}
+        ranked = self.similarity.rank(claim, tagged, m=len(tagged))
+        needed = set()
+        for positions in kept.values():
+            needed.update([i for i, p in enumerate(ranked) if p['_pos'] in positions][:m])
+        needed = sorted(needed)
+        
+        entailments = self.entailment.compute_batch(claim, [ranked[i]['text'] for i in needed])
+        scores = []
+        for i, n_i in zip(needed, entailments):
+            entry = {
+                "similarity": ranked[i]['similarity_score'],
+                "entailment": n_i,
+                "weight": self.credibility.calculate(ranked[i].get('url', 'http://internal.wiki')),
+                "rank": ranked[i].get('rank', 0)
+            }
+            if ks:
+                # The configurations in which this passage survives deduplication
+                entry["kept_for"] = [k for k in ks if ranked[i]['_pos'] in kept[k]]
+            scores.append(entry)
+        return scores
+
+    @staticmethod
+    def derive_verdict(scores: List[Dict], k: int, m: int, theta: float = 0.4,
+                       ks: List[int] = None) -> Dict:
+        """
+        Result of a (k, M, theta) configuration from score_evidence() output,
+        by arithmetic alone. Matches verify_with_evidence on the same evidence.
+        `ks` is the list the scores were computed for; deduplication was only
+        resolved for those k, so any other k is refused.
+        """
+        if any('kept_for' in p for p in scores) and (ks is None or k not in ks):
+            raise ValueError(f"Scores were deduplicated for ks={ks}; cannot derive k={k}")
+        top = [p for p in scores if p['rank'] < k and k in p.get('kept_for', (k,))][:m]
+        truth_prime, confidence = truth_functional([(p['similarity'], p['entailment'], p['weight']) for p in top])
+        return {
+            "truth_score": truth_prime,
+            "confidence": confidence,
+            "verdict": verdict_for(truth_prime, theta),
+            "evidence_count": len(top)
+        }
+
+    def verify_many(self, claims: List[str], k: int = None, m: int = None,
+                    max_workers: int = 8) -> Iterator[Tuple[int, Dict]]:
+        """
+        V(C_j) for a batch of claims, yielding (index, result) as each claim finishes.
+        Retrieval runs concurrently; claims whose retrieval has completed are
+        verified together as a wave: one encode pass over the union of their
+        passages and one NLI pass over the union of (claim, passage) pairs.
+        A slow retrieval only delays its own claim.
+        Each result carries "timings": its own retrieval and aggregation, plus the
+        ranking and NLI passes of its wave (shared with the wave's other claims).
+        """
+        k = k or self.k
+        m = m or self.m
+        # Not a `with` block: a consumer that stops early (a disconnected
+        # /verify/batch client) closes this generator, and shutdown(wait=True)
+        # would block it until every queued retrieval had run
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            pending = {pool.submit(self._retrieve_timed, c, k): i for i, c in enumerate(claims)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                wave_idx, wave_passages, wave_timings = [], [], []
+                for future in done:
+                    i = pending.pop(future)
+                    try:
+                        passages, timings = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] Retrieval failed for claim {i}: {e}")
+                        passages, timings = [], {}
+                    wave_idx.append(i)
+                    wave_passages.append(passages)
+                    wave_timings.append(timings)
+                yield from self._verify_wave([claims[i] for i in wave_idx], wave_idx, wave_passages, m,
+                                             wave_timings)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _retrieve_timed(self, claim: str, k: int) -> Tuple[List[Dict[str, str]], Dict[str, Dict]]:
+        # Runs on a pool thread, so its spans are collected apart from the caller's
+        with collect_timings() as timings:
+            with span("retrieval"):
+                passages = self.retriever.retrieve(claim, None, k)
+        return passages, timings.as_dict()
+
+    def _verify_wave(self, claims: List[str], indices: List[int],
+                     passage_lists: List[List[Dict[str, str]]], m: int,
+                     timing_lists: List[Dict[str, Dict]] = None) -> Iterator[Tuple[int, Dict]]:
+        # Collectors are closed before each yield, so no timings context leaks
+        # into the consumer of this generator
+        with collect_timings() as wave:
+            passage_lists = [self._dedup(ps) for ps in passage_lists]
+            with span("rank"):
+                tops = self.similarity.rank_many(claims, passage_lists, m=m)
+            pairs = [(c, p['text']) for c, top in zip(claims, tops) for p in top]
+            entailments = self.entailment.compute_pairs(pairs)
+        shared = wave.as_dict()
+        
+        offset = 0
+        for j, (i, claim, top) in enumerate(zip(indices, claims, tops)):
+            with collect_timings() as own:
+                with span("aggregate"):
+                    result = self._aggregate(claim, top, entailments[offset:offset + len(top)])
+            timings = Timings()
+            timings.update(timing_lists[j] if timing_lists else {})
+            timings.update(shared)
+            timings.update(own.as_dict())
+            result["timings"] = timings.as_dict()
+            yield i, result
+            offset += len(top)
+
+    def _aggregate(self, claim: str, top_passages: List[Dict[str, str]], entailments: List[Optional[int]]) -> Dict:
         m_actual = len(top_passages)
         
         if m_actual == 0:
@@ -54,45 +344,46 @@ class Verifier:
         # Step 3, 4, 5 — Entailment N, Credibility W, and Weighted Aggregation
         # Integrated Truth Functional: Σ (S * N * W) / Σ S
         # -------------------------------
-        numerator = 0.0
-        denominator = 0.0
+        scored = []
         trace = []
+        # Skipped passages (early exit, N = None) count as Neutral in Truth' and
+        # widen its reachable range by |S·W|; the verdict holds anywhere in that range
+        slack = 0.0
         
-        for p in top_passages:
+        for p, n_i in zip(top_passages, entailments):
             s_i = p['similarity_score']
-            n_i = self.entailment.compute(claim, p['text'])
             w_i = self.credibility.calculate(p.get('url', 'http://internal.wiki'))
+            skipped = n_i is None
+            if skipped:
+                n_i = 0
+                slack += abs(s_i * w_i)
+            scored.append((s_i, n_i, w_i))
             
-            numerator += (s_i * n_i * w_i)
-            denominator += s_i
-            
-            trace.append({
+            entry = {
                 "source": p.get('url', 'internal'),
                 "text": p['text'][:100] + "...",
                 "similarity": s_i,
-                "entailment": n_i,
+                "entailment": None if skipped else n_i,
                 "weight": w_i,
                 "contribution": s_i * n_i * w_i
-            })
+            }
+            if skipped:
+                entry["skipped"] = True
+            if p.get('duplicates'):
+                entry["duplicates"] = p['duplicates']
+            trace.append(entry)
 
-        truth_prime = numerator / denominator if denominator > 0 else 0.0
-        
         # -------------------------------
         # Step 6 — Confidence Conf(C) = |Truth'| * log(1 + M)
         # -------------------------------
-        confidence = abs(truth_prime) * math.log(1 + m_actual)
+        truth_prime, confidence = truth_functional(scored)
         
         # -------------------------------
         # Step 7 — Verdict function
         # -------------------------------
-        if truth_prime > 0.4:
-            verdict = "VERIFIED"
-        elif truth_prime < -0.4:
-            verdict = "MISINFORMATION"
-        else:
-            verdict = "UNCERTAIN"
+        verdict = verdict_for(truth_prime, self.theta)
             
-        return {
+        result = {
             "claim": claim,
             "truth_score": truth_prime,
             "confidence": confidence,
@@ -100,6 +391,12 @@ class Verifier:
             "evidence_count": m_actual,
             "trace": trace
         }
+        skipped = sum(1 for n_i in entailments if n_i is None)
+        if skipped:
+            denominator = sum(s_i for s_i, _, _ in scored)
+            result["skipped_count"] = skipped
+            result["truth_bounds"] = [truth_prime - slack / denominator, truth_prime + slack / denominator]
+        return result
 
 if __name__ == "__main__":
     # Internal research trace test
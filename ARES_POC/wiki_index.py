@@ -0,0 +1,116 @@
+# Disk-backed FEVER wiki index.
+# Built once from the wiki-pages/*.jsonl dump into:
+#   sentences.bin  - every sentence, UTF-8, concatenated
+#   offsets.u64    - memory-mapped byte offsets into sentences.bin (n_sentences + 1)
+#   pages.sqlite3  - page title -> (first sentence id, sentence count)
+#   meta.json      - written last; marks a complete build
+# Lookups touch one index row and one sentence, so workers start instantly and
+# share the OS page cache instead of each holding the dump in RAM.
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import struct
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from passage_store import LazyMaps, ReadOnlyDB, map_array
+
+class WikiIndex:
+    def __init__(self, index_dir: str = "wiki-index/"):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), 'r') as f:
+            self.meta = json.load(f)
+        self._db = ReadOnlyDB(os.path.join(index_dir, "pages.sqlite3"))
+        self._maps = LazyMaps(lambda: {
+            "offsets": map_array(os.path.join(index_dir, "offsets.u64"), '<u8'),
+            "sentences": map_array(os.path.join(index_dir, "sentences.bin"), np.uint8),
+        })
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return os.path.exists(os.path.join(index_dir, "meta.json"))
+
+    @staticmethod
+    def build(wiki_dir: str = "wiki-pages/", index_dir: str = "wiki-index/") -> "WikiIndex":
+        """
+        One-time build step. Expected input format:
+        {"id": "Page_Title", "text": "Sentence 0\\nSentence 1..."}
+        """
+        if not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+        meta_path = os.path.join(index_dir, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        db_path = os.path.join(index_dir, "pages.sqlite3")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE pages (title TEXT PRIMARY KEY, start INTEGER, count INTEGER) WITHOUT ROWID")
+        n_sentences = 0
+        offset = 0
+        with open(os.path.join(index_dir, "sentences.bin"), 'wb') as sent_f, \
+             open(os.path.join(index_dir, "offsets.u64"), 'wb') as off_f:
+            off_f.write(struct.pack('<Q', 0))
+            for file in sorted(glob.glob(os.path.join(wiki_dir, "*.jsonl"))):
+                with open(file, 'r', encoding='utf-8') as f:
+                    rows = []
+                    for line in f:
+                        try:
+                            obj = json.loads(line)
+                            sentences = obj["text"].split("\n")
+                        except:
+                            continue
+                        start = n_sentences
+                        for s in sentences:
+                            data = s.encode('utf-8')
+                            sent_f.write(data)
+                            offset += len(data)
+                            off_f.write(struct.pack('<Q', offset))
+                        n_sentences += len(sentences)
+                        rows.append((obj["id"], start, len(sentences)))
+                    # Later duplicates win, matching the old dict-based index
+                    conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?)", rows)
+        conn.commit()
+        n_pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        conn.close()
+
+        with open(meta_path, 'w') as f:
+            json.dump({"pages": n_pages, "sentences": n_sentences, "source": wiki_dir}, f)
+        return WikiIndex(index_dir)
+
+    def __len__(self) -> int:
+        return self.meta["pages"]
+
+    def iter_sentences(self) -> Iterator[Tuple[str, int, str]]:
+        """
+        Yields (page_title, line_id, sentence) for every indexed sentence, in build order.
+        """
+        maps = self._maps.get()
+        offsets, sentences = maps["offsets"], maps["sentences"]
+        for title, start, count in self._db.conn().execute("SELECT title, start, count FROM pages ORDER BY start"):
+            for line_id in range(count):
+                i = start + line_id
+                yield title, line_id, sentences[int(offsets[i]):int(offsets[i + 1])].tobytes().decode('utf-8')
+
+    def get_sentence(self, page_title: str, line_id: int) -> str:
+        row = self._db.conn().execute("SELECT start, count FROM pages WHERE title = ?", (page_title,)).fetchone()
+        if row is None or not 0 <= line_id < row[1]:
+            return ""
+        maps = self._maps.get()
+        offsets, sentences = maps["offsets"], maps["sentences"]
+        i = row[0] + line_id
+        return sentences[int(offsets[i]):int(offsets[i + 1])].tobytes().decode('utf-8')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the disk-backed FEVER wiki index")
+    parser.add_argument("--wiki-dir", type=str, default="wiki-pages/")
+    parser.add_argument("--index-dir", type=str, default="wiki-index/")
+    args = parser.parse_args()
+
+    index = WikiIndex.build(args.wiki_dir, args.index_dir)
+    print(f"Index built: {len(index)} pages, {index.meta['sentences']} sentences.")